@@ -3,14 +3,27 @@ agent/graph.py
 
 LangGraph StateGraph definition for the diabetes monitoring agent.
 Pipeline: Investigator → Reflector → (conditional) Communicator → END
+With settings.agent_combined_llm: Investigator → Combined → END
 """
 
+import functools
+from typing import Literal
+
 from langgraph.graph import END, StateGraph
 
+from agent.nodes.combined import combined_node
 from agent.nodes.communicator import communicator_node
 from agent.nodes.investigator import investigator_node
 from agent.nodes.reflector import reflector_node
 from agent.state import AgentState
+from config import settings
+
+
+def _route_after_reflector(state: AgentState) -> Literal["communicator", "end"]:
+    """Route to the Communicator only when an intervention is needed."""
+    if state["intervention_action"] != "NO_ACTION":
+        return "communicator"
+    return "end"
 
 
 def build_graph() -> StateGraph:
@@ -21,23 +34,43 @@ def build_graph() -> StateGraph:
     1. Investigator: gathers context from MCP Servers
     2. Reflector: LLM-based clinical risk assessment
     3. Communicator: generates and sends user notification (only if action needed)
+
+    When settings.agent_combined_llm is enabled, steps 2 and 3 run as a single
+    Combined node that makes one LLM call.
     """
     graph = StateGraph(AgentState)
 
     graph.add_node("investigator", investigator_node)
+    graph.set_entry_point("investigator")
+
+    if settings.agent_combined_llm:
+        graph.add_node("combined", combined_node)
+        graph.add_edge("investigator", "combined")
+        graph.add_edge("combined", END)
+        return graph.compile()
+
     graph.add_node("reflector", reflector_node)
     graph.add_node("communicator", communicator_node)
 
-    graph.set_entry_point("investigator")
     graph.add_edge("investigator", "reflector")
 
     # Skip communicator if no intervention is needed
     graph.add_conditional_edges(
         "reflector",
-        lambda state: (
-            "communicator" if state["intervention_action"] != "NO_ACTION" else END
-        ),
+        _route_after_reflector,
+        {"communicator": "communicator", "end": END},
     )
     graph.add_edge("communicator", END)
 
     return graph.compile()
+
+
+@functools.lru_cache(maxsize=1)
+def get_graph() -> StateGraph:
+    """
+    Return the compiled workflow, building it once per worker process.
+
+    The compiled graph holds no per-task state (that lives in the state dict
+    passed to ainvoke), so a single instance is safe to reuse across tasks.
+    """
+    return build_graph()
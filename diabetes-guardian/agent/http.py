@@ -0,0 +1,79 @@
+"""
+agent/http.py
+
+Shared httpx.AsyncClient for MCP Server calls made by the agent nodes.
+One pooled client is kept per event loop so keep-alive connections are
+reused across MCP calls instead of paying a TCP handshake per request.
+"""
+
+import asyncio
+import concurrent.futures
+
+import httpx
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+# All MCP calls use timeout=5.0 per agent.md Section 3.4
+_TIMEOUT_S: float = 5.0
+
+_LIMITS = httpx.Limits(
+    max_keepalive_connections=100,
+    max_connections=200,
+    keepalive_expiry=30.0,
+)
+
+_client: httpx.AsyncClient | None = None
+_client_loop: asyncio.AbstractEventLoop | None = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """
+    Return the shared client, creating it on first use.
+
+    Pooled connections are bound to the event loop that opened them, so a new
+    client is created if the running loop differs from the one that owns it.
+    The replaced client is closed on its own loop.
+    """
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop:
+        if _client is not None:
+            _close_on_owner_loop(_client, _client_loop)
+        _client = httpx.AsyncClient(timeout=_TIMEOUT_S, limits=_LIMITS)
+        _client_loop = loop
+    return _client
+
+
+def _close_on_owner_loop(
+    client: httpx.AsyncClient,
+    loop: asyncio.AbstractEventLoop | None,
+) -> None:
+    """Schedule aclose() of a client on the event loop that owns its connections."""
+    if loop is None or loop.is_closed():
+        # Its transports can only be closed by their loop, which is gone
+        logger.warning("http_client_loop_closed", action="client_discarded")
+        return
+
+    def _log_failure(future: concurrent.futures.Future[None]) -> None:
+        if not future.cancelled() and future.exception() is not None:
+            logger.warning(
+                "http_client_close_failed", error=str(future.exception())
+            )
+
+    future = asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+    future.add_done_callback(_log_failure)
+
+
+async def close_client() -> None:
+    """Close the shared client and release its pooled connections."""
+    global _client, _client_loop
+    if _client is None:
+        return
+    try:
+        await _client.aclose()
+    except Exception as exc:
+        logger.warning("http_client_close_failed", error=str(exc))
+    finally:
+        _client = None
+        _client_loop = None
@@ -6,15 +6,30 @@ Defines the Celery app and the investigation task that drives the LangGraph agen
 """
 
 import asyncio
-import json
+import threading
+from datetime import datetime
 
+import orjson
 import structlog
 from celery import Celery
+from celery.signals import worker_process_init, worker_process_shutdown
+from kombu.serialization import register
 
+from agent.http import close_client
 from config import settings
 
 logger = structlog.get_logger(__name__)
 
+# Task payloads are encoded with orjson, so the worker decodes each message
+# once in C and receives the task dict directly
+register(
+    "orjson",
+    orjson.dumps,
+    orjson.loads,
+    content_type="application/x-orjson",
+    content_encoding="binary",
+)
+
 celery_app = Celery(
     "agent",
     broker=settings.redis_url,
@@ -22,19 +37,70 @@ celery_app = Celery(
 )
 
 celery_app.conf.update(
-    task_serializer="json",
-    accept_content=["json"],
+    task_serializer="orjson",
+    accept_content=["orjson", "json"],  # results are still JSON-encoded
     result_serializer="json",
     timezone="Asia/Shanghai",
     enable_utc=True,
 )
 
-
-async def _run_graph(task_json: str) -> None:
-    """Async entrypoint that builds and invokes the LangGraph workflow."""
-    from agent.graph import build_graph
-
-    task_data = json.loads(task_json)
+# Long-lived event loop for this worker process, run in a daemon thread so that
+# connection pools and LLM client state survive across tasks
+_loop: asyncio.AbstractEventLoop | None = None
+_loop_lock = threading.Lock()
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """Return the worker's background event loop, starting it on first use."""
+    global _loop
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=_loop.run_forever,
+                name="agent-event-loop",
+                daemon=True,
+            ).start()
+    return _loop
+
+
+@worker_process_init.connect
+def _start_event_loop(**_kwargs: object) -> None:
+    """Start the background event loop when a worker process boots."""
+    _get_loop()
+    logger.info("agent_event_loop_started")
+
+
+async def _close_clients() -> None:
+    """Close the shared HTTP client and the Reflector cache client."""
+    # Imported here like the graph, so loading this module stays lightweight
+    from agent.nodes.reflector import close_redis
+
+    await asyncio.gather(close_client(), close_redis())
+
+
+@worker_process_shutdown.connect
+def _stop_event_loop(**_kwargs: object) -> None:
+    """Close the shared network clients and stop the loop on worker shutdown."""
+    global _loop
+    if _loop is None or _loop.is_closed():
+        return
+    try:
+        asyncio.run_coroutine_threadsafe(_close_clients(), _loop).result(timeout=5.0)
+    except Exception as exc:
+        logger.warning("agent_client_close_failed", error=str(exc))
+    _loop.call_soon_threadsafe(_loop.stop)
+    _loop = None
+    logger.info("agent_event_loop_stopped")
+
+
+async def _run_graph(task: dict) -> None:
+    """Async entrypoint that invokes the cached LangGraph workflow."""
+    from agent.graph import get_graph
+
+    task_data = dict(task)
+    # Parsed once here so nodes can use the datetime directly
+    task_data["trigger_at_dt"] = datetime.fromisoformat(task_data["trigger_at"])
     user_id = task_data["user_id"]
 
     logger.info("agent_graph_starting", user_id=user_id, trigger_type=task_data.get("trigger_type"))
@@ -53,7 +119,7 @@ async def _run_graph(task_json: str) -> None:
         "notification_sent": False,
     }
 
-    graph = build_graph()
+    graph = get_graph()
     final_state = await graph.ainvoke(initial_state)
 
     logger.info(
@@ -66,11 +132,14 @@ async def _run_graph(task_json: str) -> None:
 
 
 @celery_app.task(name="agent.tasks.run_investigation")
-def run_investigation(task_json: str) -> None:
+def run_investigation(task: dict | str) -> None:
     """
     Celery task that drives the LangGraph agent workflow.
 
-    Uses asyncio.run() to bridge Celery's sync interface with async graph execution,
-    per agent.md Section 3.2.
+    Bridges Celery's sync interface with async graph execution by submitting
+    the coroutine to the worker's long-lived event loop (agent.md Section 3.2).
     """
-    asyncio.run(_run_graph(task_json))
+    # Messages queued by gateways predating orjson task payloads carry a JSON string
+    if isinstance(task, str):
+        task = orjson.loads(task)
+    asyncio.run_coroutine_threadsafe(_run_graph(task), _get_loop()).result()
@@ -0,0 +1,146 @@
+"""
+agent/nodes/combined.py
+
+Combined Reflector + Communicator node.
+Performs the clinical risk assessment and drafts the user notification in a
+single Gemini call, then delivers the message if an intervention is needed.
+Enabled via settings.agent_combined_llm; the two-node pipeline remains the default.
+"""
+
+import functools
+
+import structlog
+from langchain_google_genai import ChatGoogleGenerativeAI
+from pydantic import ValidationError
+
+from agent.nodes.communicator import deliver_message, fallback_message
+from agent.nodes.reflector import (
+    ReflectorOutput,
+    build_user_prompt,
+    fallback_assessment,
+)
+from agent.state import AgentState, PromptInputs
+from config import settings
+
+logger = structlog.get_logger(__name__)
+
+# System prompt combining the Reflector guidelines and Communicator requirements
+SYSTEM_PROMPT = """
+你是一名专业的糖尿病管理 AI 助手，同时也是用户的健康伴侣，严格遵循以下指南：
+1. 低血糖分级：Level 1 (3.0–3.9), Level 2 (<3.0), Level 3 (<2.8 且有症状)
+2. 运动前血糖安全区间：5.6–10.0 mmol/L（高强度运动）
+3. 你的职责是预防，而非诊断
+4. 若需要干预，生成一条推送通知 message_to_user：
+   - 语气温暖友好，risk_level=HIGH 时才可使用"注意"等词
+   - 给出 1 个具体可执行的建议（如：吃什么、吃多少克）
+   - 字数控制在 80 字以内
+   - 必须提及当前血糖数值
+   intervention_action 为 NO_ACTION 时 message_to_user 为空字符串
+5. 仅输出以下 JSON，不附加任何其他文字：
+   {
+     "risk_level": "LOW" | "MEDIUM" | "HIGH",
+     "reasoning_summary": "...",
+     "intervention_action": "NO_ACTION" | "SOFT_REMIND" | "STRONG_ALERT",
+     "message_to_user": "..."
+   }
+"""
+
+
+class CombinedOutput(ReflectorOutput):
+    """Risk assessment plus the drafted notification."""
+
+    message_to_user: str = ""
+
+
+# Reflector (512) + Communicator (256) budgets per agent.md Section 6.3
+_COMBINED_MAX_TOKENS: int = 768
+
+
+@functools.lru_cache(maxsize=1)
+def _get_llm() -> ChatGoogleGenerativeAI:
+    """Return the combined-node LLM client, constructed once per worker process."""
+    return ChatGoogleGenerativeAI(
+        model=settings.llm_model,
+        google_api_key=settings.google_api_key,
+        max_output_tokens=_COMBINED_MAX_TOKENS,
+        temperature=0.1,
+    )
+
+
+async def combined_node(state: AgentState) -> dict:
+    """
+    Assess clinical risk and generate the notification in one LLM round-trip.
+
+    Falls back to the Reflector's rule-based assessment and the Communicator's
+    template message when the LLM is unavailable or returns invalid JSON.
+    Returns only the fields this node is responsible for (partial state update).
+    """
+    user_prompt = build_user_prompt(PromptInputs.from_state(state))
+    assessment = fallback_assessment()
+    message = ""
+    raw_content: str | None = None
+
+    # Client construction can raise too (pydantic ValidationError on bad settings)
+    try:
+        llm = _get_llm()
+
+        messages = [
+            ("system", SYSTEM_PROMPT),
+            ("human", user_prompt),
+        ]
+
+        response = await llm.ainvoke(messages)
+        raw_content = response.content.strip()
+
+    except Exception as exc:
+        logger.error(
+            "llm_call_failed",
+            user_id=state["user_id"],
+            error=str(exc),
+            fallback="rule_based",
+        )
+
+    if raw_content is not None:
+        # Parse and validate the JSON response from LLM in a single pass
+        try:
+            parsed = CombinedOutput.model_validate_json(raw_content, strict=True)
+        except ValidationError as exc:
+            logger.error(
+                "llm_parse_failed",
+                user_id=state["user_id"],
+                raw_response=raw_content,
+                error=str(exc),
+                fallback="rule_based",
+            )
+        else:
+            assessment = parsed.model_dump(exclude={"message_to_user"})
+            message = parsed.message_to_user.strip()
+
+    if assessment["intervention_action"] == "NO_ACTION":
+        logger.info(
+            "combined_complete",
+            user_id=state["user_id"],
+            risk_level=assessment["risk_level"],
+            intervention_action=assessment["intervention_action"],
+        )
+        return {**assessment, "message_to_user": None, "notification_sent": False}
+
+    if not message:
+        message = fallback_message(state)
+
+    # The intervention log reads the assessment fields from state
+    notification_sent = await deliver_message({**state, **assessment}, message)
+
+    logger.info(
+        "combined_complete",
+        user_id=state["user_id"],
+        risk_level=assessment["risk_level"],
+        intervention_action=assessment["intervention_action"],
+        message_length=len(message),
+    )
+
+    return {
+        **assessment,
+        "message_to_user": message,
+        "notification_sent": notification_sent,
+    }
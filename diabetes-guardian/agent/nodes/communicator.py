@@ -6,15 +6,18 @@ Generates a personalized push notification message and delivers it to the user.
 Logs the intervention to the database.
 """
 
-import json
-from datetime import datetime
+import asyncio
+import functools
+from datetime import datetime, timezone
 
+import orjson
 import structlog
 from langchain_google_genai import ChatGoogleGenerativeAI
+from sqlalchemy import insert
 
-from agent.state import AgentState
+from agent.state import AgentState, PromptInputs
 from config import settings
-from db.models import AsyncSessionLocal, InterventionLog
+from db.models import InterventionLog, engine
 from gateway.services.notification import send_push
 
 logger = structlog.get_logger(__name__)
@@ -29,55 +32,73 @@ COMMUNICATOR_PROMPT = """
 - 必须提及当前血糖数值
 """
 
+# Fixed part of the human message built from reflector outputs
+_COMMUNICATOR_INPUT_TEMPLATE: str = (
+    "Risk level: {risk}\n"
+    "Clinical reasoning: {reasoning}\n"
+    "Intervention type: {action}\n"
+    "Current glucose: {glucose} mmol/L\n"
+    "Location: {location}"
+)
+
 # Max tokens per agent.md Section 6.3
 _COMMUNICATOR_MAX_TOKENS: int = 256
 
 
-def _build_communicator_prompt(state: AgentState) -> str:
+@functools.lru_cache(maxsize=1)
+def _get_llm() -> ChatGoogleGenerativeAI:
+    """Return the Communicator LLM client, constructed once per worker process."""
+    return ChatGoogleGenerativeAI(
+        model=settings.llm_model,
+        google_api_key=settings.google_api_key,
+        max_output_tokens=_COMMUNICATOR_MAX_TOKENS,
+        temperature=0.7,
+    )
+
+
+def _build_communicator_prompt(inputs: PromptInputs) -> str:
     """Build the input prompt for message generation from reflector outputs."""
-    task = state["task"]
-    parts = [
-        f"Risk level: {state.get('risk_level', 'UNKNOWN')}",
-        f"Clinical reasoning: {state.get('reasoning_summary', 'N/A')}",
-        f"Intervention type: {state.get('intervention_action', 'N/A')}",
-        f"Current glucose: {task.get('current_glucose', 'N/A')} mmol/L",
-        f"Location: {state.get('location_context', 'N/A')}",
-    ]
-
-    upcoming = state.get("upcoming_activity")
+    prompt = _COMMUNICATOR_INPUT_TEMPLATE.format(
+        risk=inputs.risk_level,
+        reasoning=inputs.reasoning_summary,
+        action=inputs.intervention_action,
+        glucose=inputs.current_glucose,
+        location=inputs.location_context,
+    )
+
+    upcoming = inputs.upcoming_activity
     if upcoming:
-        parts.append(f"Upcoming activity: {upcoming}")
+        prompt += f"\nUpcoming activity: {upcoming}"
 
-    return "\n".join(parts)
+    return prompt
 
 
 async def _log_intervention(state: AgentState, message: str) -> None:
     """Persist the intervention record to the database."""
     try:
-        async with AsyncSessionLocal() as session:
-            log_entry = InterventionLog(
-                user_id=state["user_id"],
-                triggered_at=datetime.fromisoformat(
-                    state["task"].get("trigger_at", datetime.utcnow().isoformat())
-                ),
-                trigger_type=state["task"].get("trigger_type"),
-                agent_decision=json.dumps(
-                    {
-                        "risk_level": state.get("risk_level"),
-                        "reasoning_summary": state.get("reasoning_summary"),
-                        "intervention_action": state.get("intervention_action"),
-                    },
-                    ensure_ascii=False,
-                ),
-                message_sent=message,
-            )
-            session.add(log_entry)
-            await session.commit()
-            logger.info(
-                "intervention_logged",
-                user_id=state["user_id"],
-                trigger_type=state["task"].get("trigger_type"),
+        async with engine.begin() as conn:
+            await conn.execute(
+                insert(InterventionLog).values(
+                    user_id=state["user_id"],
+                    triggered_at=(
+                        state["task"].get("trigger_at_dt") or datetime.now(timezone.utc)
+                    ),
+                    trigger_type=state["task"].get("trigger_type"),
+                    agent_decision=orjson.dumps(
+                        {
+                            "risk_level": state.get("risk_level"),
+                            "reasoning_summary": state.get("reasoning_summary"),
+                            "intervention_action": state.get("intervention_action"),
+                        }
+                    ).decode("utf-8"),
+                    message_sent=message,
+                )
             )
+        logger.info(
+            "intervention_logged",
+            user_id=state["user_id"],
+            trigger_type=state["task"].get("trigger_type"),
+        )
     except Exception as exc:
         logger.error(
             "intervention_log_failed",
@@ -86,21 +107,51 @@ async def _log_intervention(state: AgentState, message: str) -> None:
         )
 
 
+def fallback_message(state: AgentState) -> str:
+    """Template notification used when the LLM cannot generate a message."""
+    glucose = state["task"].get("current_glucose", "N/A")
+    return f"您当前血糖 {glucose} mmol/L，建议适当补充碳水化合物。"
+
+
+async def deliver_message(state: AgentState, message: str) -> bool:
+    """
+    Send the push notification and log the intervention concurrently.
+
+    Returns True if the push notification was sent.
+    """
+    push_result, log_result = await asyncio.gather(
+        send_push(state["user_id"], message),
+        _log_intervention(state, message),
+        return_exceptions=True,
+    )
+
+    # Report each failure separately so one does not mask the other
+    if isinstance(push_result, Exception):
+        logger.error(
+            "push_notification_failed",
+            user_id=state["user_id"],
+            error=str(push_result),
+        )
+    if isinstance(log_result, Exception):
+        logger.error(
+            "intervention_log_failed",
+            user_id=state["user_id"],
+            error=str(log_result),
+        )
+
+    return not isinstance(push_result, Exception)
+
+
 async def communicator_node(state: AgentState) -> dict:
     """
     Generate a personalized notification and send it to the user.
 
     Returns only the fields this node is responsible for (partial state update).
     """
-    user_prompt = _build_communicator_prompt(state)
+    user_prompt = _build_communicator_prompt(PromptInputs.from_state(state))
 
     try:
-        llm = ChatGoogleGenerativeAI(
-            model=settings.llm_model,
-            google_api_key=settings.google_api_key,
-            max_output_tokens=_COMMUNICATOR_MAX_TOKENS,
-            temperature=0.7,
-        )
+        llm = _get_llm()
 
         messages = [
             ("system", COMMUNICATOR_PROMPT),
@@ -117,15 +168,9 @@ async def communicator_node(state: AgentState) -> dict:
             error=str(exc),
             fallback="template_message",
         )
-        # Fallback template message
-        glucose = state["task"].get("current_glucose", "N/A")
-        message = f"您当前血糖 {glucose} mmol/L，建议适当补充碳水化合物。"
-
-    # Send push notification
-    await send_push(state["user_id"], message)
+        message = fallback_message(state)
 
-    # Log the intervention
-    await _log_intervention(state, message)
+    notification_sent = await deliver_message(state, message)
 
     logger.info(
         "communicator_complete",
@@ -135,5 +180,5 @@ async def communicator_node(state: AgentState) -> dict:
 
     return {
         "message_to_user": message,
-        "notification_sent": True,
+        "notification_sent": notification_sent,
     }
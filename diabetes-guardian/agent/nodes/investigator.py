@@ -7,15 +7,22 @@ to gather contextual data for the Reflector node.
 """
 
 import asyncio
+from datetime import timezone
 
 import httpx
+import orjson
 import structlog
 
+from agent.http import get_client
 from agent.state import AgentState
 from config import settings
 
 logger = structlog.get_logger(__name__)
 
+# Tool endpoints resolved once at import instead of on every call
+_LOCATION_URL: str = f"{settings.location_context_mcp_url}/tools/get_semantic_location"
+_HISTORY_URL: str = f"{settings.patient_history_mcp_url}/tools/get_patient_context"
+
 # Fallback values per agent.md Section 3.3
 _LOCATION_FALLBACK: dict = {
     "semantic_location": "未知位置",
@@ -36,15 +43,14 @@ async def call_location_context_mcp(
     user_id: str,
 ) -> dict:
     """Call the Location Context MCP server to resolve semantic location."""
-    url = f"{settings.location_context_mcp_url}/tools/get_semantic_location"
+    url = _LOCATION_URL
     try:
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            response = await client.post(
-                url,
-                json={"user_id": user_id, "lat": lat, "lng": lng},
-            )
-            response.raise_for_status()
-            return response.json()
+        response = await get_client().post(
+            url,
+            json={"user_id": user_id, "lat": lat, "lng": lng},
+        )
+        response.raise_for_status()
+        return orjson.loads(response.content)
     except httpx.TimeoutException:
         logger.warning(
             "mcp_timeout",
@@ -73,18 +79,23 @@ async def call_location_context_mcp(
 
 async def call_patient_history_mcp(
     user_id: str,
-    reference_time: str,
+    reference_time: float,
 ) -> dict:
-    """Call the Patient History MCP server to retrieve patient context."""
-    url = f"{settings.patient_history_mcp_url}/tools/get_patient_context"
+    """
+    Call the Patient History MCP server to retrieve patient context.
+
+    reference_time is Unix epoch seconds; history timestamps come back the same way.
+    Naive wall-clock times are read as UTC on both sides, so the result does
+    not depend on the timezone of either process or of the MySQL session.
+    """
+    url = _HISTORY_URL
     try:
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            response = await client.post(
-                url,
-                json={"user_id": user_id, "reference_time": reference_time},
-            )
-            response.raise_for_status()
-            return response.json()
+        response = await get_client().post(
+            url,
+            json={"user_id": user_id, "reference_time": reference_time},
+        )
+        response.raise_for_status()
+        return orjson.loads(response.content)
     except httpx.TimeoutException:
         logger.warning(
             "mcp_timeout",
@@ -124,7 +135,10 @@ async def investigator_node(state: AgentState) -> dict:
         call_location_context_mcp(
             task["gps_lat"], task["gps_lng"], task["user_id"]
         ),
-        call_patient_history_mcp(task["user_id"], task["trigger_at"]),
+        call_patient_history_mcp(
+            task["user_id"],
+            task["trigger_at_dt"].replace(tzinfo=timezone.utc).timestamp(),
+        ),
     )
 
     logger.info(
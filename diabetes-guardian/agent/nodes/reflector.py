@@ -6,13 +6,26 @@ Performs LLM-based clinical risk assessment using Gemini.
 Falls back to rule-based assessment if LLM is unavailable.
 """
 
-import json
+import functools
+import hashlib
+import statistics
+from contextlib import aclosing
+from datetime import datetime, timezone
+from typing import Literal
 
+import redis.asyncio as redis
 import structlog
 from langchain_google_genai import ChatGoogleGenerativeAI
+from pydantic import BaseModel, ValidationError
 
-from agent.state import AgentState
+from agent.state import AgentState, PromptInputs
 from config import settings
+from gateway.constants import (
+    DECLINE_PROJECTION_MIN,
+    GLUCOSE_EXERCISE_SAFE_MAX,
+    GLUCOSE_EXERCISE_SAFE_MIN,
+    SLOPE_WINDOW_MIN,
+)
 
 logger = structlog.get_logger(__name__)
 
@@ -30,6 +43,15 @@ SYSTEM_PROMPT = """
    }
 """
 
+
+class ReflectorOutput(BaseModel):
+    """Structured risk assessment the LLM must return."""
+
+    risk_level: Literal["LOW", "MEDIUM", "HIGH"]
+    reasoning_summary: str
+    intervention_action: Literal["NO_ACTION", "SOFT_REMIND", "STRONG_ALERT"]
+
+
 # Rule-based fallback per agent.md Section 3.3
 _FALLBACK_RESPONSE: dict = {
     "risk_level": "MEDIUM",
@@ -37,37 +59,309 @@ _FALLBACK_RESPONSE: dict = {
     "intervention_action": "SOFT_REMIND",
 }
 
+# Fixed head of the user prompt; optional sections are appended after it
+_USER_PROMPT_TEMPLATE: str = (
+    "Current glucose: {glucose} mmol/L\n"
+    "Current heart rate: {hr} bpm\n"
+    "Trigger type: {trigger}\n"
+    "Location: {location}"
+)
+
+# Optional upcoming-activity line; keys follow the Patient History MCP schema
+_UPCOMING_TEMPLATE: str = (
+    "Upcoming activity: {type}, probability={probability}, "
+    "avg glucose drop={avg_drop} mmol/L"
+)
+
+# Raw readings kept in the prompt after the history summary
+_RECENT_READINGS_IN_PROMPT: int = 5
+
+# Returned without an LLM call when telemetry is clearly in the safe range
+_SAFE_RANGE_RESPONSE: dict = {
+    "risk_level": "LOW",
+    "reasoning_summary": "血糖处于安全区间，按当前下降趋势推算仍不会跌出安全区间，规则判定无需干预",
+    "intervention_action": "NO_ACTION",
+}
+
+# Pre-exercise triggers always need the LLM: the gateway already found an
+# activity, even if the investigator's own lookup missed it or timed out
+_ALWAYS_ASSESS_TRIGGER_TYPES: frozenset[str] = frozenset({
+    "SOFT_PRE_EXERCISE_LOW_BUFFER",
+})
+
+# Trend triggers skip the LLM only if the projected decline stays safe
+_TREND_TRIGGER_TYPES: frozenset[str] = frozenset({"SOFT_GLUCOSE_DECLINE_SLOPE"})
+
 # Max tokens per agent.md Section 6.3
 _REFLECTOR_MAX_TOKENS: int = 512
 
+# Identical prompts within this window reuse the cached LLM assessment
+_REFLECTOR_CACHE_TTL_S: int = 180
+_REFLECTOR_CACHE_PREFIX: str = "refl:"
 
-def _build_user_prompt(state: AgentState) -> str:
-    """Construct the user prompt containing all investigator data."""
+
+@functools.lru_cache(maxsize=1)
+def _get_llm() -> ChatGoogleGenerativeAI:
+    """Return the Reflector LLM client, constructed once per worker process."""
+    return ChatGoogleGenerativeAI(
+        model=settings.llm_model,
+        google_api_key=settings.google_api_key,
+        max_output_tokens=_REFLECTOR_MAX_TOKENS,
+        temperature=0.1,
+    )
+
+
+@functools.lru_cache(maxsize=1)
+def _get_redis() -> redis.Redis:
+    """Return the Redis client used for the Reflector response cache."""
+    return redis.from_url(settings.redis_url)
+
+
+async def close_redis() -> None:
+    """Close the Reflector cache client if this worker ever created one."""
+    if _get_redis.cache_info().currsize == 0:
+        return
+    client = _get_redis()
+    _get_redis.cache_clear()
+    try:
+        await client.aclose()
+    except Exception as exc:
+        logger.warning("reflector_cache_close_failed", error=str(exc))
+
+
+def _is_cacheable(state: AgentState) -> bool:
+    """Hard-trigger assessments are never served from cache."""
+    trigger_type = state["task"].get("trigger_type") or ""
+    return not trigger_type.startswith("HARD")
+
+
+def _cache_key(user_prompt: str) -> str:
+    """Derive the cache key from the full prompt sent to the LLM."""
+    digest = hashlib.sha256(
+        (SYSTEM_PROMPT + user_prompt).encode("utf-8")
+    ).hexdigest()
+    return _REFLECTOR_CACHE_PREFIX + digest
+
+
+async def _cache_get(key: str) -> str | None:
+    """Look up a cached LLM response; cache errors are treated as a miss."""
+    try:
+        cached = await _get_redis().get(key)
+    except Exception as exc:
+        logger.warning("reflector_cache_get_failed", error=str(exc))
+        return None
+    return cached.decode("utf-8") if cached is not None else None
+
+
+async def _cache_set(key: str, raw_content: str) -> None:
+    """Store a successfully parsed LLM response; errors are logged only."""
+    try:
+        await _get_redis().setex(key, _REFLECTOR_CACHE_TTL_S, raw_content)
+    except Exception as exc:
+        logger.warning("reflector_cache_set_failed", error=str(exc))
+
+
+class _JsonObjectScanner:
+    """
+    Incrementally locate the first complete top-level JSON object in a stream.
+
+    Tracks brace depth outside of string literals, so each streamed character
+    is inspected exactly once regardless of how many chunks arrive.
+    """
+
+    __slots__ = ("_pos", "depth", "end", "escaped", "in_string", "start")
+
+    def __init__(self) -> None:
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.start: int | None = None
+        self.end: int | None = None
+        self._pos = 0
+
+    def feed(self, chunk: str) -> bool:
+        """Consume a chunk; return True once the first object has closed."""
+        for ch in chunk:
+            pos = self._pos
+            self._pos += 1
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == "\\":
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == "{":
+                if self.depth == 0:
+                    self.start = pos
+                self.depth += 1
+            elif self.depth == 0:
+                continue
+            elif ch == '"':
+                self.in_string = True
+            elif ch == "}":
+                self.depth -= 1
+                if self.depth == 0:
+                    self.end = pos + 1
+                    return True
+        return False
+
+
+async def _stream_json_object(
+    llm: ChatGoogleGenerativeAI,
+    messages: list[tuple[str, str]],
+) -> str:
+    """
+    Stream the LLM response and stop reading once a JSON object is complete.
+
+    Returns the first balanced object, or the whole stripped response if none
+    closed (which then fails validation and takes the fallback path).
+    """
+    scanner = _JsonObjectScanner()
+    chunks: list[str] = []
+    async with aclosing(llm.astream(messages)) as stream:
+        async for chunk in stream:
+            chunks.append(chunk.content)
+            if scanner.feed(chunk.content):
+                break
+
+    text = "".join(chunks)
+    if scanner.end is None:
+        return text.strip()
+    return text[scanner.start:scanner.end]
+
+
+def _is_clearly_safe(state: AgentState) -> bool:
+    """
+    Check whether the assessment is obvious without the LLM.
+
+    True when current glucose is within the exercise-safe range, no activity
+    is upcoming, no recent exercise drops are recorded, and the trigger type
+    does not by itself call for an assessment. For a glucose-decline trigger,
+    the decline measured from the 24h history, extrapolated over
+    DECLINE_PROJECTION_MIN minutes, must also end inside the safe range.
+    """
     task = state["task"]
-    parts = [
-        f"Current glucose: {task.get('current_glucose', 'N/A')} mmol/L",
-        f"Current heart rate: {task.get('current_hr', 'N/A')} bpm",
-        f"Trigger type: {task.get('trigger_type', 'N/A')}",
-        f"Location: {state.get('location_context', 'N/A')}",
+    glucose = task.get("current_glucose")
+    trigger_type = task.get("trigger_type")
+    if not (
+        glucose is not None
+        and GLUCOSE_EXERCISE_SAFE_MIN <= glucose <= GLUCOSE_EXERCISE_SAFE_MAX
+        and trigger_type not in _ALWAYS_ASSESS_TRIGGER_TYPES
+        and state.get("upcoming_activity") is None
+        and not state.get("recent_exercise_glucose_drops")
+    ):
+        return False
+    if trigger_type not in _TREND_TRIGGER_TYPES:
+        return True
+
+    slope = _recent_slope(state.get("glucose_history_24h") or [])
+    if slope is None:
+        return False
+    return glucose + slope * DECLINE_PROJECTION_MIN >= GLUCOSE_EXERCISE_SAFE_MIN
+
+
+def _recent_slope(history: list[dict]) -> float | None:
+    """
+    Least-squares glucose slope (mmol/L per minute) over the last
+    SLOPE_WINDOW_MIN minutes. History is ordered newest first, with times
+    in Unix epoch seconds (wall-clock time read as UTC).
+    """
+    try:
+        latest = history[0]["time"]
+        minutes: list[float] = []
+        values: list[float] = []
+        for record in history:
+            age_min = (latest - record["time"]) / 60.0
+            if age_min > SLOPE_WINDOW_MIN:
+                break
+            minutes.append(-age_min)
+            values.append(record["glucose"])
+        return statistics.linear_regression(minutes, values).slope
+    except (
+        IndexError, KeyError, TypeError, ValueError, statistics.StatisticsError
+    ):
+        return None
+
+
+def _numeric_readings(history: list[dict]) -> list[dict]:
+    """
+    Keep readings with an epoch-seconds time and a glucose value.
+
+    Older Patient History MCP builds send ISO-string times, and readings may
+    carry glucose=None; neither can be summarized or formatted below.
+    """
+    return [
+        record
+        for record in history
+        if isinstance(record.get("time"), (int, float))
+        and isinstance(record.get("glucose"), (int, float))
     ]
 
-    history = state.get("glucose_history_24h")
+
+def _summarize_glucose_history(history: list[dict]) -> str:
+    """
+    Condense the 24h history into summary statistics plus the latest readings,
+    instead of inlining every record in the prompt.
+
+    history must be non-empty and already filtered by _numeric_readings.
+    """
+    values = [record["glucose"] for record in history]
+    slope = _recent_slope(history)
+    slope_text = f"{slope:+.3f}" if slope is not None else "N/A"
+    # Epoch seconds encode wall-clock time as UTC; render it back the same way
+    recent = ", ".join(
+        f"({datetime.fromtimestamp(record['time'], timezone.utc):%m-%d %H:%M}, "
+        f"{record['glucose']})"
+        for record in history[:_RECENT_READINGS_IN_PROMPT]
+    )
+    return (
+        f"24h glucose history ({len(values)} records): "
+        f"min={min(values):.1f}, max={max(values):.1f}, "
+        f"mean={statistics.fmean(values):.1f} mmol/L, "
+        f"last {SLOPE_WINDOW_MIN} min slope={slope_text} mmol/L/min\n"
+        f"Most recent readings (newest first): {recent}"
+    )
+
+
+def fallback_assessment() -> dict:
+    """Rule-based assessment used when the LLM is unavailable or returns bad JSON."""
+    return dict(_FALLBACK_RESPONSE)
+
+
+def build_user_prompt(inputs: PromptInputs) -> str:
+    """Construct the user prompt containing all investigator data."""
+    head = _USER_PROMPT_TEMPLATE.format(
+        glucose=inputs.current_glucose,
+        hr=inputs.current_hr,
+        trigger=inputs.trigger_type,
+        location=inputs.location_context,
+    )
+
+    tail: list[str] = []
+
+    history = _numeric_readings(inputs.glucose_history_24h or [])
     if history:
-        parts.append(f"24h glucose history (recent {len(history)} records): {history}")
+        tail.append(_summarize_glucose_history(history))
 
-    upcoming = state.get("upcoming_activity")
+    upcoming = inputs.upcoming_activity
     if upcoming:
-        parts.append(
-            f"Upcoming activity: {upcoming.get('type', 'unknown')}, "
-            f"probability={upcoming.get('probability', 'N/A')}, "
-            f"avg glucose drop={upcoming.get('avg_drop', 'N/A')} mmol/L"
+        get = upcoming.get
+        tail.append(
+            _UPCOMING_TEMPLATE.format(
+                type=get("type", "unknown"),
+                probability=get("probability", "N/A"),
+                avg_drop=get("avg_glucose_drop", "N/A"),
+            )
         )
 
-    drops = state.get("recent_exercise_glucose_drops")
+    drops = inputs.recent_exercise_glucose_drops
     if drops:
-        parts.append(f"Recent exercise glucose drops: {drops}")
+        tail.append(f"Recent exercise glucose drops: {drops}")
 
-    return "\n".join(parts)
+    if not tail:
+        return head
+    return head + "\n" + "\n".join(tail)
 
 
 async def reflector_node(state: AgentState) -> dict:
@@ -76,55 +370,67 @@ async def reflector_node(state: AgentState) -> dict:
 
     Returns only the fields this node is responsible for (partial state update).
     """
-    user_prompt = _build_user_prompt(state)
-
-    try:
-        llm = ChatGoogleGenerativeAI(
-            model=settings.llm_model,
-            google_api_key=settings.google_api_key,
-            max_output_tokens=_REFLECTOR_MAX_TOKENS,
-            temperature=0.1,
+    if _is_clearly_safe(state):
+        logger.info(
+            "reflector_complete",
+            user_id=state["user_id"],
+            risk_level=_SAFE_RANGE_RESPONSE["risk_level"],
+            intervention_action=_SAFE_RANGE_RESPONSE["intervention_action"],
+            fast_path=True,
         )
+        return dict(_SAFE_RANGE_RESPONSE)
 
-        messages = [
-            ("system", SYSTEM_PROMPT),
-            ("human", user_prompt),
-        ]
+    user_prompt = build_user_prompt(PromptInputs.from_state(state))
+    cache_key = _cache_key(user_prompt) if _is_cacheable(state) else None
 
-        response = await llm.ainvoke(messages)
-        raw_content = response.content.strip()
+    # Client construction can raise too (pydantic ValidationError on bad settings)
+    try:
+        raw_content = await _cache_get(cache_key) if cache_key else None
+        cache_hit = raw_content is not None
 
-        # Parse JSON response from LLM
-        parsed = json.loads(raw_content)
+        if not cache_hit:
+            llm = _get_llm()
 
-        logger.info(
-            "reflector_complete",
-            user_id=state["user_id"],
-            risk_level=parsed.get("risk_level"),
-            intervention_action=parsed.get("intervention_action"),
-        )
+            messages = [
+                ("system", SYSTEM_PROMPT),
+                ("human", user_prompt),
+            ]
 
-        return {
-            "risk_level": parsed["risk_level"],
-            "reasoning_summary": parsed["reasoning_summary"],
-            "intervention_action": parsed["intervention_action"],
-        }
+            raw_content = await _stream_json_object(llm, messages)
 
-    except json.JSONDecodeError as exc:
+    except Exception as exc:
         logger.error(
-            "llm_parse_failed",
+            "llm_call_failed",
             user_id=state["user_id"],
-            raw_response=raw_content if "raw_content" in dir() else "N/A",
             error=str(exc),
             fallback="rule_based",
         )
-        return dict(_FALLBACK_RESPONSE)
+        return fallback_assessment()
 
-    except Exception as exc:
+    # Parse and validate the JSON response from LLM in a single pass
+    try:
+        parsed = ReflectorOutput.model_validate_json(raw_content, strict=True)
+    except ValidationError as exc:
         logger.error(
-            "llm_call_failed",
+            "llm_parse_failed",
             user_id=state["user_id"],
+            raw_response=raw_content,
             error=str(exc),
             fallback="rule_based",
         )
-        return dict(_FALLBACK_RESPONSE)
+        return fallback_assessment()
+
+    result = parsed.model_dump()
+
+    if cache_key and not cache_hit:
+        await _cache_set(cache_key, raw_content)
+
+    logger.info(
+        "reflector_complete",
+        user_id=state["user_id"],
+        risk_level=result["risk_level"],
+        intervention_action=result["intervention_action"],
+        cache_hit=cache_hit,
+    )
+
+    return result
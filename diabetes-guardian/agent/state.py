@@ -4,8 +4,12 @@ agent/state.py
 AgentState TypedDict definition for the LangGraph workflow.
 Fields are append-only: existing field names and types must not be changed.
 New fields must be Optional with default None.
+
+PromptInputs is a slotted snapshot of the state values read by the LLM
+prompt builders.
 """
 
+from dataclasses import dataclass
 from typing import Optional, TypedDict
 
 
@@ -30,3 +34,41 @@ class AgentState(TypedDict):
     # ── Communicator outputs ─────────────────────────────────
     message_to_user: Optional[str]
     notification_sent: bool
+
+
+@dataclass(slots=True)
+class PromptInputs:
+    """State values read by the Reflector and Communicator prompt builders."""
+
+    # ── Task fields ──────────────────────────────────────────
+    current_glucose: float | str
+    current_hr: int | str
+    trigger_type: str
+
+    # ── Investigator outputs ─────────────────────────────────
+    location_context: Optional[str]
+    glucose_history_24h: Optional[list]
+    upcoming_activity: Optional[dict]
+    recent_exercise_glucose_drops: Optional[list[float]]
+
+    # ── Reflector outputs ────────────────────────────────────
+    risk_level: Optional[str]
+    reasoning_summary: Optional[str]
+    intervention_action: Optional[str]
+
+    @classmethod
+    def from_state(cls, state: AgentState) -> "PromptInputs":
+        """Extract prompt inputs from the state in a single pass."""
+        task = state["task"]
+        return cls(
+            current_glucose=task.get("current_glucose", "N/A"),
+            current_hr=task.get("current_hr", "N/A"),
+            trigger_type=task.get("trigger_type", "N/A"),
+            location_context=state.get("location_context", "N/A"),
+            glucose_history_24h=state.get("glucose_history_24h"),
+            upcoming_activity=state.get("upcoming_activity"),
+            recent_exercise_glucose_drops=state.get("recent_exercise_glucose_drops"),
+            risk_level=state.get("risk_level", "UNKNOWN"),
+            reasoning_summary=state.get("reasoning_summary", "N/A"),
+            intervention_action=state.get("intervention_action", "N/A"),
+        )
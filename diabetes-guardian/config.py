@@ -26,9 +26,15 @@ class Settings(BaseSettings):
     google_api_key: str = ""
     llm_model: str = "gemini-2.0-pro"
 
+    # Agent
+    agent_combined_llm: bool = False  # single LLM call for Reflector + Communicator
+
     # MCP Servers
     patient_history_mcp_url: str = "http://127.0.0.1:8001"
     location_context_mcp_url: str = "http://127.0.0.1:8002"
+    mcp_db_pool_size: int = 20
+    mcp_db_max_overflow: int = 40
+    mcp_db_pool_recycle_s: int = 300
 
     # Push notifications
     fcm_server_key: str = ""
@@ -18,7 +18,7 @@ CREATE TABLE IF NOT EXISTS user_telemetry_log (
     glucose DECIMAL(5, 2),
     gps_lat DECIMAL(10, 7),
     gps_lng DECIMAL(10, 7),
-    INDEX idx_user_time (user_id, recorded_at)
+    INDEX idx_telemetry_user_time (user_id, recorded_at, glucose)
 );
 
 CREATE TABLE IF NOT EXISTS user_weekly_patterns (
@@ -30,10 +30,12 @@ CREATE TABLE IF NOT EXISTS user_weekly_patterns (
     probability DECIMAL(4, 3),
     avg_glucose_drop DECIMAL(5, 2),
     sample_count INT,
-    INDEX idx_user_pattern (
+    -- Composite, not covering: lookups still read the row and sort by probability
+    INDEX idx_pattern_user_dow_hour (
         user_id,
         day_of_week,
-        hour_of_day
+        hour_of_day,
+        probability DESC
     )
 );
 
@@ -44,7 +46,7 @@ CREATE TABLE IF NOT EXISTS user_known_places (
     place_type VARCHAR(50),
     gps_lat DECIMAL(10, 7),
     gps_lng DECIMAL(10, 7),
-    INDEX idx_user_places (user_id)
+    INDEX idx_place_latlng (user_id, gps_lat, gps_lng)
 );
 
 CREATE TABLE IF NOT EXISTS intervention_log (
@@ -0,0 +1,10 @@
+-- db/migrations/001_known_places_latlng_index.sql
+--
+-- Replaces the user_id-only index on user_known_places with a composite
+-- (user_id, gps_lat, gps_lng) index used by the Location Context MCP nearest
+-- place query, which filters on user_id and non-null coordinates.
+-- New databases get this index from db/init.sql.
+
+ALTER TABLE user_known_places
+    ADD INDEX idx_place_latlng (user_id, gps_lat, gps_lng),
+    DROP INDEX idx_user_places;
@@ -0,0 +1,27 @@
+-- db/migrations/002_covering_indexes.sql
+--
+-- Widens the hot-path indexes:
+-- - user_telemetry_log (user_id, recorded_at, glucose) covers the gateway
+--   data gap check and the Patient History MCP 24h glucose history, which
+--   read only these columns.
+-- - user_weekly_patterns (user_id, day_of_week, hour_of_day, probability DESC)
+--   is a plain composite index, not a covering one. It narrows the activity
+--   lookups in the gateway soft trigger and the Patient History MCP to the
+--   matching rows, but both still read the full row (activity_type,
+--   avg_glucose_drop), and because they match a set or range of hours, the
+--   ORDER BY probability DESC still sorts the few matching rows.
+-- Each new index keeps the old one as a prefix, so the old one is dropped.
+-- New databases get these indexes from db/init.sql.
+
+ALTER TABLE user_telemetry_log
+    ADD INDEX idx_telemetry_user_time (user_id, recorded_at, glucose),
+    DROP INDEX idx_user_time;
+
+ALTER TABLE user_weekly_patterns
+    ADD INDEX idx_pattern_user_dow_hour (
+        user_id,
+        day_of_week,
+        hour_of_day,
+        probability DESC
+    ),
+    DROP INDEX idx_user_pattern;
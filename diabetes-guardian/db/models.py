@@ -5,31 +5,40 @@ SQLAlchemy 2.0 async ORM model definitions.
 Maps to the tables defined in db/init.sql.
 """
 
-from datetime import datetime
+from datetime import datetime, timezone
 from decimal import Decimal
 
 from sqlalchemy import Boolean, DateTime, Integer, Numeric, String, Text
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, sessionmaker
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 
 from config import settings
 
-# Async engine with connection pool settings
+# Async engine with connection pool settings.
+# Connections are recycled after 30 min (below MySQL's wait_timeout) instead of
+# being pinged with SELECT 1 on every checkout.
 engine = create_async_engine(
     f"mysql+aiomysql://{settings.mysql_user}:{settings.mysql_password}"
     f"@{settings.mysql_host}:{settings.mysql_port}/{settings.mysql_db}",
     pool_size=10,
     max_overflow=20,
-    pool_pre_ping=True,
+    pool_recycle=1800,
+    pool_pre_ping=False,
 )
 
-AsyncSessionLocal = sessionmaker(
+# Sessions only run single inserts or selects, so implicit autoflush is skipped
+AsyncSessionLocal = async_sessionmaker(
     engine,
-    class_=AsyncSession,
     expire_on_commit=False,
+    autoflush=False,
 )
 
 
+def _utcnow() -> datetime:
+    """Timezone-aware UTC timestamp used as the Python-side column default."""
+    return datetime.now(timezone.utc)
+
+
 class Base(DeclarativeBase):
     """Base class for all ORM models."""
 
@@ -45,7 +54,7 @@ class User(Base):
     name: Mapped[str | None] = mapped_column(String(100), nullable=True)
     birth_year: Mapped[int | None] = mapped_column(Integer, nullable=True)
     created_at: Mapped[datetime | None] = mapped_column(
-        DateTime, default=datetime.utcnow
+        DateTime(timezone=True), default=_utcnow
     )
 
 
@@ -106,7 +115,7 @@ class InterventionLog(Base):
     message_sent: Mapped[str | None] = mapped_column(Text, nullable=True)
     user_ack: Mapped[bool | None] = mapped_column(Boolean, default=False)
     created_at: Mapped[datetime | None] = mapped_column(
-        DateTime, default=datetime.utcnow
+        DateTime(timezone=True), default=_utcnow
     )
 
 
@@ -119,4 +128,6 @@ class ErrorLog(Base):
     service: Mapped[str | None] = mapped_column(String(50), nullable=True)
     error_msg: Mapped[str | None] = mapped_column(Text, nullable=True)
     payload: Mapped[str | None] = mapped_column(Text, nullable=True)
-    ts: Mapped[datetime | None] = mapped_column(DateTime, default=datetime.utcnow)
+    ts: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True), default=_utcnow
+    )
@@ -20,6 +20,7 @@ MAX_HR_RATIO: float = 0.90  # (220 - age) * MAX_HR_RATIO
 TELEMETRY_GAP_ALERT_MIN: int = 30
 SLOPE_WINDOW_MIN: int = 20
 PRE_EXERCISE_WARN_MIN: int = 60
+DECLINE_PROJECTION_MIN: int = 30  # horizon for extrapolating a glucose decline
 
 # ── Soft trigger thresholds ──────────────────────────────────
 ACTIVITY_PROBABILITY_THRESHOLD: float = 0.70
@@ -30,3 +31,4 @@ KNOWN_PLACE_RADIUS_M: int = 200
 
 # ── Sliding window config ────────────────────────────────────
 SLIDING_WINDOW_MAX_LEN: int = 20
+SLIDING_WINDOW_MAX_USERS: int = 100_000  # least recently active users evicted
@@ -2,7 +2,8 @@
 gateway/main.py
 
 FastAPI application entry point for the Gateway service.
-Initializes the httpx client lifecycle and registers routers.
+Initializes the httpx client lifecycle, the telemetry batch writer,
+and registers routers.
 """
 
 from contextlib import asynccontextmanager
@@ -12,6 +13,10 @@ import structlog
 from fastapi import FastAPI
 
 from gateway.routers.telemetry import router as telemetry_router
+from gateway.services.persistence import (
+    start_telemetry_writer,
+    stop_telemetry_writer,
+)
 
 logger = structlog.get_logger(__name__)
 
@@ -20,8 +25,10 @@ logger = structlog.get_logger(__name__)
 async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     """Manage application lifecycle: startup and shutdown."""
     logger.info("gateway_starting", port=8000)
+    await start_telemetry_writer()
     yield
     logger.info("gateway_shutting_down")
+    await stop_telemetry_writer()
 
 
 app = FastAPI(
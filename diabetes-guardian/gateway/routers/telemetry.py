@@ -12,7 +12,11 @@ from fastapi import APIRouter
 
 from gateway.schemas import TelemetryPayload
 from gateway.services.persistence import get_user_age, persist_telemetry
-from gateway.services.triage import evaluate_hard_triggers, evaluate_soft_triggers
+from gateway.services.triage import (
+    evaluate_hard_triggers,
+    evaluate_soft_triggers,
+    lookup_upcoming_activity,
+)
 
 logger = structlog.get_logger(__name__)
 
@@ -26,7 +30,8 @@ async def receive_telemetry(payload: TelemetryPayload) -> dict[str, str]:
 
     Flow:
     1. Look up user age from the database
-    2. Concurrently persist the record and evaluate triggers
+    2. Concurrently persist the record, evaluate hard triggers and look up
+       the upcoming activity needed by the soft triggers
     3. If hard trigger fires, skip soft trigger evaluation
     4. If soft trigger fires, enqueue a Celery task for the Agent
     """
@@ -48,10 +53,11 @@ async def receive_telemetry(payload: TelemetryPayload) -> dict[str, str]:
             default_age=user_age,
         )
 
-    # Run persistence and hard trigger evaluation concurrently
-    _, hard_triggered = await asyncio.gather(
+    # Run persistence, hard trigger evaluation and the activity lookup concurrently
+    _, hard_triggered, upcoming = await asyncio.gather(
         persist_telemetry(payload),
         evaluate_hard_triggers(payload, user_age),
+        lookup_upcoming_activity(payload),
     )
 
     # If hard trigger fired, do not evaluate soft triggers
@@ -59,7 +65,7 @@ async def receive_telemetry(payload: TelemetryPayload) -> dict[str, str]:
         return {"status": "received", "trigger": "hard"}
 
     # Evaluate soft triggers
-    investigation_task = await evaluate_soft_triggers(payload, user_age)
+    investigation_task = await evaluate_soft_triggers(payload, user_age, upcoming)
     if investigation_task is not None:
         # Enqueue investigation task via Celery
         try:
@@ -67,7 +73,7 @@ async def receive_telemetry(payload: TelemetryPayload) -> dict[str, str]:
 
             celery_app.send_task(
                 "agent.tasks.run_investigation",
-                args=[investigation_task.model_dump_json()],
+                args=[investigation_task.model_dump()],
             )
             logger.info(
                 "investigation_task_enqueued",
@@ -3,36 +3,68 @@ gateway/services/persistence.py
 
 Persists incoming telemetry records to the MySQL database.
 Uses SQLAlchemy 2.0 async sessions.
+Telemetry is queued and written in micro-batches by a background writer
+started from the gateway lifespan.
 """
 
+import asyncio
+import time
+from datetime import datetime
+
 import structlog
-from sqlalchemy import select
+from sqlalchemy import insert, select
 
 from db.models import AsyncSessionLocal, User, UserTelemetryLog
 from gateway.schemas import TelemetryPayload
 
 logger = structlog.get_logger(__name__)
 
+# Ages change once a year, so a per-user cache saves a users lookup per event
+_AGE_CACHE_TTL_S: float = 3600.0
+_AGE_CACHE_MAX_USERS: int = 10_000
+
+# user_id -> (age, monotonic expiry time)
+_age_cache: dict[str, tuple[int, float]] = {}
+
+# Telemetry micro-batching: one INSERT and commit per batch instead of per event
+_TELEMETRY_BATCH_MAX: int = 200
+_TELEMETRY_BATCH_WINDOW_S: float = 0.05
+_TELEMETRY_QUEUE_MAX: int = 10_000  # producers wait when the writer falls behind
+
+_telemetry_queue: asyncio.Queue | None = None
+_telemetry_writer: asyncio.Task | None = None
+
+
+def _telemetry_row(payload: TelemetryPayload) -> dict:
+    """Map a telemetry payload to a user_telemetry_log row."""
+    return {
+        "user_id": payload.user_id,
+        "recorded_at": payload.timestamp,
+        "heart_rate": payload.heart_rate,
+        "glucose": payload.glucose,
+        "gps_lat": payload.gps_lat,
+        "gps_lng": payload.gps_lng,
+    }
+
 
 async def persist_telemetry(payload: TelemetryPayload) -> None:
-    """Insert a telemetry record into user_telemetry_log."""
+    """
+    Queue a telemetry record for insertion into user_telemetry_log.
+
+    Falls back to a direct single-row insert when the batch writer is not
+    running (e.g. outside the gateway application).
+    """
+    if _telemetry_queue is not None:
+        await _telemetry_queue.put(_telemetry_row(payload))
+        return
+
     try:
-        async with AsyncSessionLocal() as session:
-            record = UserTelemetryLog(
-                user_id=payload.user_id,
-                recorded_at=payload.timestamp,
-                heart_rate=payload.heart_rate,
-                glucose=payload.glucose,
-                gps_lat=payload.gps_lat,
-                gps_lng=payload.gps_lng,
-            )
-            session.add(record)
-            await session.commit()
-            logger.info(
-                "telemetry_persisted",
-                user_id=payload.user_id,
-                recorded_at=str(payload.timestamp),
-            )
+        await _insert_telemetry([_telemetry_row(payload)])
+        logger.info(
+            "telemetry_persisted",
+            user_id=payload.user_id,
+            recorded_at=str(payload.timestamp),
+        )
     except Exception as exc:
         logger.error(
             "telemetry_persist_failed",
@@ -42,8 +74,122 @@ async def persist_telemetry(payload: TelemetryPayload) -> None:
         raise
 
 
+async def start_telemetry_writer() -> None:
+    """Create the telemetry queue and start the background batch writer."""
+    global _telemetry_queue, _telemetry_writer
+    _telemetry_queue = asyncio.Queue(maxsize=_TELEMETRY_QUEUE_MAX)
+    _telemetry_writer = asyncio.create_task(_telemetry_writer_loop(_telemetry_queue))
+
+
+async def stop_telemetry_writer() -> None:
+    """Flush queued telemetry and stop the background batch writer."""
+    global _telemetry_queue, _telemetry_writer
+    if _telemetry_queue is None or _telemetry_writer is None:
+        return
+    queue, writer = _telemetry_queue, _telemetry_writer
+    # New payloads go straight to the database while the queue drains
+    _telemetry_queue = None
+    _telemetry_writer = None
+    await queue.put(None)  # sentinel: flush and exit
+    await writer
+
+
+async def _telemetry_writer_loop(queue: asyncio.Queue) -> None:
+    """
+    Drain the queue in batches of up to _TELEMETRY_BATCH_MAX rows, waiting at
+    most _TELEMETRY_BATCH_WINDOW_S after the first row for more to arrive.
+    """
+    loop = asyncio.get_running_loop()
+    stopping = False
+    while not stopping:
+        first = await queue.get()
+        if first is None:
+            break
+        batch = [first]
+        deadline = loop.time() + _TELEMETRY_BATCH_WINDOW_S
+        while len(batch) < _TELEMETRY_BATCH_MAX:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                row = await asyncio.wait_for(queue.get(), timeout)
+            except TimeoutError:
+                break
+            if row is None:
+                stopping = True
+                break
+            batch.append(row)
+        await _flush_telemetry(batch)
+
+    # Rows from producers that were blocked on a full queue during shutdown.
+    # Each get_nowait() wakes another blocked producer, which enqueues its row
+    # once it gets a turn, so yield and drain again until nothing arrives.
+    while True:
+        await asyncio.sleep(0)
+        if queue.empty():
+            break
+        leftover: list[dict] = []
+        while not queue.empty() and len(leftover) < _TELEMETRY_BATCH_MAX:
+            row = queue.get_nowait()
+            if row is not None:
+                leftover.append(row)
+        if leftover:
+            await _flush_telemetry(leftover)
+
+
+async def _insert_telemetry(rows: list[dict]) -> None:
+    """Insert telemetry rows in one statement and commit."""
+    async with AsyncSessionLocal() as session:
+        await session.execute(insert(UserTelemetryLog), rows)
+        await session.commit()
+
+
+async def _flush_telemetry(batch: list[dict]) -> None:
+    """
+    Insert a batch of telemetry rows with a single commit.
+
+    If the batch insert fails, the rows are retried one at a time so a single
+    malformed payload only loses its own reading, not the rest of the batch.
+    """
+    try:
+        await _insert_telemetry(batch)
+        logger.info("telemetry_batch_persisted", count=len(batch))
+        return
+    except Exception as exc:
+        logger.warning(
+            "telemetry_batch_failed",
+            count=len(batch),
+            error=str(exc),
+            fallback="row_by_row",
+        )
+
+    persisted = 0
+    for row in batch:
+        try:
+            await _insert_telemetry([row])
+            persisted += 1
+        except Exception as exc:
+            logger.error(
+                "telemetry_persist_failed",
+                user_id=row["user_id"],
+                recorded_at=str(row["recorded_at"]),
+                error=str(exc),
+            )
+    logger.info("telemetry_batch_persisted", count=persisted, row_by_row=True)
+
+
 async def get_user_age(user_id: str) -> int | None:
-    """Retrieve the user's age from the users table based on birth_year."""
+    """
+    Retrieve the user's age from the users table based on birth_year.
+
+    Results are cached in-process for _AGE_CACHE_TTL_S seconds; missing
+    profiles are not cached so a newly created user is picked up immediately.
+    """
+    now = time.monotonic()
+    cached = _age_cache.get(user_id)
+    if cached is not None and cached[1] > now:
+        return cached[0]
+
     try:
         async with AsyncSessionLocal() as session:
             result = await session.execute(
@@ -53,9 +199,6 @@ async def get_user_age(user_id: str) -> int | None:
             if birth_year is None:
                 logger.warning("user_birth_year_missing", user_id=user_id)
                 return None
-            from datetime import datetime
-
-            return datetime.now().year - birth_year
     except Exception as exc:
         logger.error(
             "user_age_query_failed",
@@ -63,3 +206,10 @@ async def get_user_age(user_id: str) -> int | None:
             error=str(exc),
         )
         return None
+
+    age = datetime.now().year - birth_year
+    if user_id not in _age_cache and len(_age_cache) >= _AGE_CACHE_MAX_USERS:
+        # Evict the oldest inserted entry
+        del _age_cache[next(iter(_age_cache))]
+    _age_cache[user_id] = (age, now + _AGE_CACHE_TTL_S)
+    return age
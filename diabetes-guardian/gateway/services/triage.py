@@ -9,13 +9,13 @@ Uses constants from gateway/constants.py; no magic numbers allowed.
 """
 
 import asyncio
-import collections
+from array import array
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import Optional
 
-import numpy as np
 import structlog
-from sqlalchemy import func, select
+from sqlalchemy import literal, select
 
 from db.models import AsyncSessionLocal, UserTelemetryLog, UserWeeklyPattern
 from gateway.constants import (
@@ -27,6 +27,7 @@ from gateway.constants import (
     MAX_HR_RATIO,
     PRE_EXERCISE_WARN_MIN,
     SLIDING_WINDOW_MAX_LEN,
+    SLIDING_WINDOW_MAX_USERS,
     SLOPE_WINDOW_MIN,
     TELEMETRY_GAP_ALERT_MIN,
 )
@@ -35,9 +36,119 @@ from gateway.services.notification import send_emergency_alert
 
 logger = structlog.get_logger(__name__)
 
+
+class _SlopeWindow:
+    """
+    Per-user sliding window with running least-squares aggregates.
+
+    Readings live in two preallocated ring buffers (time, glucose) rather than
+    a deque of tuples, so ingesting a reading allocates no Python objects.
+    The sums Σt, Σg, Σtg and Σt² are kept up to date on every append, so the
+    glucose slope is available in O(1) per tick.
+    Times are stored in minutes relative to an epoch-second origin that is
+    moved to the oldest sample once per full window turnover, which bounds
+    the magnitude of the sums and discards accumulated floating-point drift.
+    """
+
+    __slots__ = (
+        "_appends",
+        "_count",
+        "_g",
+        "_head",
+        "_origin",
+        "_sg",
+        "_st",
+        "_stg",
+        "_stt",
+        "_t",
+    )
+
+    def __init__(self) -> None:
+        self._t = array("d", bytes(8 * SLIDING_WINDOW_MAX_LEN))
+        self._g = array("d", bytes(8 * SLIDING_WINDOW_MAX_LEN))
+        self._head = 0  # next write position
+        self._count = 0
+        self._origin: float | None = None
+        self._appends = 0
+        self._st = self._sg = self._stg = self._stt = 0.0
+
+    def append(self, ts_epoch: float, glucose: float) -> None:
+        """Add a reading, overwriting the oldest one when the window is full."""
+        if self._origin is None:
+            self._origin = ts_epoch
+        t = (ts_epoch - self._origin) / 60.0
+
+        head = self._head
+        if self._count == SLIDING_WINDOW_MAX_LEN:
+            self._remove(self._t[head], self._g[head])
+        else:
+            self._count += 1
+        self._t[head] = t
+        self._g[head] = glucose
+        self._head = (head + 1) % SLIDING_WINDOW_MAX_LEN
+        self._add(t, glucose)
+
+        self._appends += 1
+        if self._appends >= SLIDING_WINDOW_MAX_LEN:
+            self._rebase()
+
+    def span_min(self) -> float:
+        """Return the time covered by the window in minutes."""
+        newest = (self._head - 1) % SLIDING_WINDOW_MAX_LEN
+        return self._t[newest] - self._t[self._oldest()]
+
+    def slope(self) -> float:
+        """Return the least-squares glucose slope in mmol/L per minute."""
+        n = self._count
+        return (n * self._stg - self._st * self._sg) / (
+            n * self._stt - self._st * self._st
+        )
+
+    def _oldest(self) -> int:
+        return (self._head - self._count) % SLIDING_WINDOW_MAX_LEN
+
+    def _add(self, t: float, g: float) -> None:
+        self._st += t
+        self._sg += g
+        self._stg += t * g
+        self._stt += t * t
+
+    def _remove(self, t: float, g: float) -> None:
+        self._st -= t
+        self._sg -= g
+        self._stg -= t * g
+        self._stt -= t * t
+
+    def _rebase(self) -> None:
+        """Move the origin to the oldest entry and recompute the sums exactly."""
+        shift = self._t[self._oldest()]
+        self._origin += shift * 60.0
+        self._appends = 0
+        self._st = self._sg = self._stg = self._stt = 0.0
+        start = self._oldest()
+        for offset in range(self._count):
+            i = (start + offset) % SLIDING_WINDOW_MAX_LEN
+            self._t[i] -= shift
+            self._add(self._t[i], self._g[i])
+
+    def __len__(self) -> int:
+        return self._count
+
+
+# Per-user state below is bounded to SLIDING_WINDOW_MAX_USERS entries (LRU)
 # Sliding window storage keyed by user_id
-# Each deque entry: (timestamp, glucose, heart_rate)
-_sliding_windows: dict[str, collections.deque] = {}
+_sliding_windows: OrderedDict[str, _SlopeWindow] = OrderedDict()
+
+# Latest telemetry timestamp seen per user_id, used for the data gap check
+_last_seen: OrderedDict[str, datetime] = OrderedDict()
+
+
+def _touch_lru(cache: OrderedDict, user_id: str) -> None:
+    """Mark user_id as most recently active, evicting the least recent if full."""
+    if user_id in cache:
+        cache.move_to_end(user_id)
+    elif len(cache) >= SLIDING_WINDOW_MAX_USERS:
+        cache.popitem(last=False)
 
 
 async def evaluate_hard_triggers(
@@ -66,123 +177,153 @@ async def evaluate_hard_triggers(
         )
 
     # Condition 3: telemetry data gap > TELEMETRY_GAP_ALERT_MIN minutes
+    if await _telemetry_gap_detected(payload):
+        reasons.append(
+            f"no telemetry in last {TELEMETRY_GAP_ALERT_MIN} minutes"
+        )
+
+    if reasons:
+        reason_text = "; ".join(reasons)
+        logger.info(
+            "hard_trigger_fired",
+            user_id=payload.user_id,
+            reasons=reason_text,
+        )
+        await send_emergency_alert(payload.user_id, reason_text)
+        return True
+
+    return False
+
+
+async def _telemetry_gap_detected(payload: TelemetryPayload) -> bool:
+    """
+    Return True if no telemetry arrived in the TELEMETRY_GAP_ALERT_MIN minutes
+    before this payload.
+
+    Uses the in-process last-seen timestamp; the database is only queried for
+    the first payload from a user after a process restart or LRU eviction.
+    """
+    prev = _last_seen.get(payload.user_id)
+    _touch_lru(_last_seen, payload.user_id)
+    if prev is None or payload.timestamp > prev:
+        _last_seen[payload.user_id] = payload.timestamp
+
+    if prev is not None:
+        return payload.timestamp - prev > timedelta(minutes=TELEMETRY_GAP_ALERT_MIN)
+
+    # Cold path: no reading seen yet in this process
     try:
         async with AsyncSessionLocal() as session:
             cutoff = payload.timestamp - timedelta(minutes=TELEMETRY_GAP_ALERT_MIN)
+            # Only existence matters; LIMIT 1 stops at the first index hit
             result = await session.execute(
-                select(func.count())
+                select(literal(1))
                 .select_from(UserTelemetryLog)
                 .where(
                     UserTelemetryLog.user_id == payload.user_id,
                     UserTelemetryLog.recorded_at >= cutoff,
                 )
+                .limit(1)
             )
-            recent_count = result.scalar_one()
-            if recent_count == 0:
-                reasons.append(
-                    f"no telemetry in last {TELEMETRY_GAP_ALERT_MIN} minutes"
-                )
+            return result.first() is None
     except Exception as exc:
         logger.warning(
             "hard_trigger_db_check_failed",
             user_id=payload.user_id,
             error=str(exc),
         )
+        return False
 
-    if reasons:
-        reason_text = "; ".join(reasons)
-        logger.info(
-            "hard_trigger_fired",
+
+async def lookup_upcoming_activity(payload: TelemetryPayload) -> dict | None:
+    """
+    Fetch the upcoming activity needed by the pre-exercise soft trigger.
+
+    Only queries the database when glucose is inside the soft-low buffer range,
+    so the router can run it alongside the hard trigger check.
+    Returns None if no activity is due or the lookup fails.
+    """
+    if not GLUCOSE_SOFT_LOW_MIN <= payload.glucose <= GLUCOSE_SOFT_LOW_MAX:
+        return None
+    try:
+        return await _check_upcoming_activity(payload.user_id, payload.timestamp)
+    except Exception as exc:
+        logger.warning(
+            "soft_trigger_activity_check_failed",
             user_id=payload.user_id,
-            reasons=reason_text,
+            error=str(exc),
         )
-        await send_emergency_alert(payload.user_id, reason_text)
-        return True
-
-    return False
+        return None
 
 
 async def evaluate_soft_triggers(
     payload: TelemetryPayload,
     user_age: int,
+    upcoming: dict | None = None,
 ) -> Optional[InvestigationTask]:
     """
     Evaluate soft trigger conditions using a sliding window of recent telemetry.
 
+    upcoming is the result of lookup_upcoming_activity, fetched by the caller
+    concurrently with the hard trigger check.
     Returns an InvestigationTask if a soft trigger condition is met,
     otherwise returns None.
     """
     # Maintain per-user sliding window
-    if payload.user_id not in _sliding_windows:
-        _sliding_windows[payload.user_id] = collections.deque(
-            maxlen=SLIDING_WINDOW_MAX_LEN
-        )
-    window = _sliding_windows[payload.user_id]
-    window.append((payload.timestamp, payload.glucose, payload.heart_rate))
+    window = _sliding_windows.get(payload.user_id)
+    _touch_lru(_sliding_windows, payload.user_id)
+    if window is None:
+        window = _sliding_windows[payload.user_id] = _SlopeWindow()
+    window.append(payload.timestamp.timestamp(), payload.glucose)
 
     # Condition 1: glucose decline slope < GLUCOSE_SLOPE_TRIGGER mmol/L/min
-    if len(window) >= 3:
-        timestamps_sec = [
-            (entry[0] - window[0][0]).total_seconds() / 60.0 for entry in window
-        ]
-        glucose_values = [entry[1] for entry in window]
-
-        if timestamps_sec[-1] > 0:
-            slope = float(np.polyfit(timestamps_sec, glucose_values, 1)[0])
-            if slope < GLUCOSE_SLOPE_TRIGGER:
-                logger.info(
-                    "soft_trigger_fired",
-                    user_id=payload.user_id,
-                    trigger_type="SOFT_GLUCOSE_DECLINE_SLOPE",
-                    glucose=payload.glucose,
-                    slope=slope,
-                )
-                return InvestigationTask(
-                    user_id=payload.user_id,
-                    trigger_type="SOFT_GLUCOSE_DECLINE_SLOPE",
-                    trigger_at=payload.timestamp,
-                    current_glucose=payload.glucose,
-                    current_hr=payload.heart_rate,
-                    gps_lat=payload.gps_lat,
-                    gps_lng=payload.gps_lng,
-                    context_notes=f"Glucose slope={slope:.4f} mmol/L/min",
-                )
-
-    # Condition 2: pre-exercise low buffer
-    if GLUCOSE_SOFT_LOW_MIN <= payload.glucose <= GLUCOSE_SOFT_LOW_MAX:
-        try:
-            upcoming = await _check_upcoming_activity(
-                payload.user_id, payload.timestamp
+    if len(window) >= 3 and window.span_min() > 0:
+        slope = window.slope()
+        if slope < GLUCOSE_SLOPE_TRIGGER:
+            logger.info(
+                "soft_trigger_fired",
+                user_id=payload.user_id,
+                trigger_type="SOFT_GLUCOSE_DECLINE_SLOPE",
+                glucose=payload.glucose,
+                slope=slope,
             )
-            if upcoming is not None:
-                logger.info(
-                    "soft_trigger_fired",
-                    user_id=payload.user_id,
-                    trigger_type="SOFT_PRE_EXERCISE_LOW_BUFFER",
-                    glucose=payload.glucose,
-                    upcoming_activity=upcoming["activity_type"],
-                )
-                return InvestigationTask(
-                    user_id=payload.user_id,
-                    trigger_type="SOFT_PRE_EXERCISE_LOW_BUFFER",
-                    trigger_at=payload.timestamp,
-                    current_glucose=payload.glucose,
-                    current_hr=payload.heart_rate,
-                    gps_lat=payload.gps_lat,
-                    gps_lng=payload.gps_lng,
-                    context_notes=(
-                        f"Upcoming {upcoming['activity_type']} "
-                        f"(probability={upcoming['probability']}, "
-                        f"avg_drop={upcoming['avg_glucose_drop']})"
-                    ),
-                )
-        except Exception as exc:
-            logger.warning(
-                "soft_trigger_activity_check_failed",
+            return InvestigationTask(
                 user_id=payload.user_id,
-                error=str(exc),
+                trigger_type="SOFT_GLUCOSE_DECLINE_SLOPE",
+                trigger_at=payload.timestamp,
+                current_glucose=payload.glucose,
+                current_hr=payload.heart_rate,
+                gps_lat=payload.gps_lat,
+                gps_lng=payload.gps_lng,
+                context_notes=f"Glucose slope={slope:.4f} mmol/L/min",
             )
 
+    # Condition 2: pre-exercise low buffer
+    if upcoming is not None and (
+        GLUCOSE_SOFT_LOW_MIN <= payload.glucose <= GLUCOSE_SOFT_LOW_MAX
+    ):
+        logger.info(
+            "soft_trigger_fired",
+            user_id=payload.user_id,
+            trigger_type="SOFT_PRE_EXERCISE_LOW_BUFFER",
+            glucose=payload.glucose,
+            upcoming_activity=upcoming["activity_type"],
+        )
+        return InvestigationTask(
+            user_id=payload.user_id,
+            trigger_type="SOFT_PRE_EXERCISE_LOW_BUFFER",
+            trigger_at=payload.timestamp,
+            current_glucose=payload.glucose,
+            current_hr=payload.heart_rate,
+            gps_lat=payload.gps_lat,
+            gps_lng=payload.gps_lng,
+            context_notes=(
+                f"Upcoming {upcoming['activity_type']} "
+                f"(probability={upcoming['probability']}, "
+                f"avg_drop={upcoming['avg_glucose_drop']})"
+            ),
+        )
+
     return None
 
 
@@ -6,15 +6,18 @@ Resolves GPS coordinates to semantic locations using user-defined known places.
 This is an independent FastAPI process; it must not import gateway/ or agent/ modules.
 """
 
-import math
-from typing import Optional
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, Optional
 
 import structlog
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, Request
 from pydantic import BaseModel
 from sqlalchemy import text
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import (
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
 
 from config import settings
 
@@ -23,25 +26,69 @@ logger = structlog.get_logger(__name__)
 # Known place radius threshold in meters (duplicated here to avoid cross-layer import)
 KNOWN_PLACE_RADIUS_M: int = 200
 
-# Database connection for this MCP server
-_engine = create_async_engine(
-    f"mysql+aiomysql://{settings.mysql_user}:{settings.mysql_password}"
-    f"@{settings.mysql_host}:{settings.mysql_port}/{settings.mysql_db}",
-    pool_size=5,
-    max_overflow=10,
-    pool_pre_ping=True,
-)
-_async_session = sessionmaker(_engine, class_=AsyncSession, expire_on_commit=False)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
+    """Create the database engine on startup and dispose of it on shutdown."""
+    engine = create_async_engine(
+        f"mysql+aiomysql://{settings.mysql_user}:{settings.mysql_password}"
+        f"@{settings.mysql_host}:{settings.mysql_port}/{settings.mysql_db}",
+        pool_size=settings.mcp_db_pool_size,
+        max_overflow=settings.mcp_db_max_overflow,
+        pool_recycle=settings.mcp_db_pool_recycle_s,
+        pool_pre_ping=True,
+    )
+    app.state.engine = engine
+    app.state.session_factory = async_sessionmaker(engine, expire_on_commit=False)
+
+    # Open one pooled connection up front so the first request skips the handshake
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+    except Exception as exc:
+        logger.warning("db_prewarm_failed", error=str(exc))
+
+    logger.info("location_context_mcp_starting")
+    yield
+    logger.info("location_context_mcp_shutting_down")
+    await engine.dispose()
+
+
+def get_session_factory(request: Request) -> async_sessionmaker[AsyncSession]:
+    """Dependency returning the session factory created by lifespan."""
+    return request.app.state.session_factory
+
 
 app = FastAPI(
     title="Location Context MCP Server",
     description="Resolves GPS coordinates to semantic locations",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
-# Earth radius in meters for Haversine calculation
+# Earth radius in meters for the great-circle distance calculation
 _EARTH_RADIUS_M: int = 6_371_000
 
+# Number of nearest known places returned to the Agent
+_NEARBY_PLACES_LIMIT: int = 5
+
+# Distances are computed by MySQL so only the nearest rows leave the database.
+# ST_Distance_Sphere takes POINT(lng, lat) and evaluates the Haversine formula;
+# the window aggregate checks every place for home before LIMIT is applied.
+_NEARBY_PLACES_SQL = text(
+    "SELECT place_name, place_type, distance_m, "
+    "MAX(place_type = 'home' AND distance_m <= :radius) OVER () AS at_home "
+    "FROM ("
+    "  SELECT place_name, place_type, "
+    "  ST_Distance_Sphere(POINT(gps_lng, gps_lat), POINT(:lng, :lat), :earth) "
+    "  AS distance_m "
+    "  FROM user_known_places "
+    "  WHERE user_id = :uid AND gps_lat IS NOT NULL AND gps_lng IS NOT NULL"
+    ") AS places "
+    "ORDER BY distance_m "
+    "LIMIT :limit"
+)
+
 
 # ── Request / Response models ────────────────────────────────
 
@@ -69,28 +116,12 @@ class SemanticLocationResponse(BaseModel):
     nearby_known_places: list[NearbyPlace]
 
 
-# ── Haversine distance calculation per agent.md Section 7.3 ──
-
-def haversine_distance(
-    lat1: float,
-    lng1: float,
-    lat2: float,
-    lng2: float,
-) -> int:
-    """
-    Calculate the great-circle distance between two points in meters.
+# ── Diagnostics ──────────────────────────────────────────────
 
-    Uses the Haversine formula with Earth radius = 6,371,000 meters.
-    Returns distance as an integer (meters).
-    """
-    phi1, phi2 = math.radians(lat1), math.radians(lat2)
-    dphi = math.radians(lat2 - lat1)
-    dlambda = math.radians(lng2 - lng1)
-    a = (
-        math.sin(dphi / 2) ** 2
-        + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
-    )
-    return int(2 * _EARTH_RADIUS_M * math.asin(math.sqrt(a)))
+@app.get("/debug/pool")
+async def pool_status(request: Request) -> dict[str, str]:
+    """Report the database connection pool usage for capacity monitoring."""
+    return {"status": request.app.state.engine.pool.status()}
 
 
 # ── Tool endpoint ────────────────────────────────────────────
@@ -98,59 +129,50 @@ def haversine_distance(
 @app.post("/tools/get_semantic_location", response_model=SemanticLocationResponse)
 async def get_semantic_location(
     request: SemanticLocationRequest,
+    session_factory: async_sessionmaker[AsyncSession] = Depends(get_session_factory),
 ) -> SemanticLocationResponse:
     """
     Resolve GPS coordinates to a semantic location description.
 
-    Queries user_known_places, calculates distances via Haversine,
+    Queries the nearest user_known_places with distances computed in MySQL,
     and determines if the user is at a known location (within KNOWN_PLACE_RADIUS_M).
     """
-    nearby_places: list[NearbyPlace] = []
     is_at_home: bool = False
     semantic_location: str = "未知位置"
 
-    async with _async_session() as session:
+    async with session_factory() as session:
         result = await session.execute(
-            text(
-                "SELECT place_name, place_type, gps_lat, gps_lng "
-                "FROM user_known_places "
-                "WHERE user_id = :uid"
-            ),
-            {"uid": request.user_id},
+            _NEARBY_PLACES_SQL,
+            {
+                "uid": request.user_id,
+                "lat": request.lat,
+                "lng": request.lng,
+                "radius": KNOWN_PLACE_RADIUS_M,
+                "earth": _EARTH_RADIUS_M,
+                "limit": _NEARBY_PLACES_LIMIT,
+            },
         )
         rows = result.fetchall()
 
-        for row in rows:
-            place_name, place_type, place_lat, place_lng = row
-            if place_lat is None or place_lng is None:
-                continue
-
-            distance = haversine_distance(
-                request.lat, request.lng,
-                float(place_lat), float(place_lng),
-            )
-
-            nearby_places.append(
-                NearbyPlace(
-                    name=place_name or "unnamed",
-                    distance_m=distance,
-                    type=place_type or "unknown",
-                )
-            )
-
-            # Check if user is at this known place
-            if distance <= KNOWN_PLACE_RADIUS_M:
-                semantic_location = f"在{place_name}中"
-                if place_type == "home":
-                    is_at_home = True
-
-    # Sort by distance, keep closest first
-    nearby_places.sort(key=lambda p: p.distance_m)
-
-    # If not at any known place, describe nearest one
-    if semantic_location == "未知位置" and nearby_places:
+    # Values come straight from our own query; skip Pydantic validation
+    nearby_places = [
+        NearbyPlace.model_construct(
+            name=row.place_name or "unnamed",
+            distance_m=int(row.distance_m),
+            type=row.place_type or "unknown",
+        )
+        for row in rows
+    ]
+
+    if rows:
+        is_at_home = bool(rows[0].at_home)
         nearest = nearby_places[0]
-        semantic_location = f"距离{nearest.name} {nearest.distance_m} 米"
+        # Check if user is at a known place (nearest one wins)
+        if nearest.distance_m <= KNOWN_PLACE_RADIUS_M:
+            semantic_location = f"在{rows[0].place_name}中"
+        else:
+            # Not at any known place, describe the nearest one
+            semantic_location = f"距离{nearest.name} {nearest.distance_m} 米"
 
     logger.info(
         "semantic_location_resolved",
@@ -163,5 +185,5 @@ async def get_semantic_location(
     return SemanticLocationResponse(
         semantic_location=semantic_location,
         is_at_home=is_at_home,
-        nearby_known_places=nearby_places[:5],  # Limit to 5 nearest
+        nearby_known_places=nearby_places,
     )
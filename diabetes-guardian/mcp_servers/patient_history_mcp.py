@@ -6,34 +6,65 @@ Provides tools for querying patient telemetry history and generating NL2SQL quer
 This is an independent FastAPI process; it must not import gateway/ or agent/ modules.
 """
 
-from datetime import datetime, timedelta
-from typing import Optional
+import asyncio
+import re
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import AsyncGenerator, Optional
 
+import orjson
 import structlog
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Request, Response
 from pydantic import BaseModel
 from sqlalchemy import text
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import (
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
 
 from config import settings
 
 logger = structlog.get_logger(__name__)
 
-# Database connection for this MCP server
-_engine = create_async_engine(
-    f"mysql+aiomysql://{settings.mysql_user}:{settings.mysql_password}"
-    f"@{settings.mysql_host}:{settings.mysql_port}/{settings.mysql_db}",
-    pool_size=5,
-    max_overflow=10,
-    pool_pre_ping=True,
-)
-_async_session = sessionmaker(_engine, class_=AsyncSession, expire_on_commit=False)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
+    """Create the database engine on startup and dispose of it on shutdown."""
+    engine = create_async_engine(
+        f"mysql+aiomysql://{settings.mysql_user}:{settings.mysql_password}"
+        f"@{settings.mysql_host}:{settings.mysql_port}/{settings.mysql_db}",
+        pool_size=settings.mcp_db_pool_size,
+        max_overflow=settings.mcp_db_max_overflow,
+        pool_recycle=settings.mcp_db_pool_recycle_s,
+        pool_pre_ping=True,
+    )
+    app.state.engine = engine
+    app.state.session_factory = async_sessionmaker(engine, expire_on_commit=False)
+
+    # Open one pooled connection up front so the first request skips the handshake
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+    except Exception as exc:
+        logger.warning("db_prewarm_failed", error=str(exc))
+
+    logger.info("patient_history_mcp_starting")
+    yield
+    logger.info("patient_history_mcp_shutting_down")
+    await engine.dispose()
+
+
+def get_session_factory(request: Request) -> async_sessionmaker[AsyncSession]:
+    """Dependency returning the session factory created by lifespan."""
+    return request.app.state.session_factory
+
 
 app = FastAPI(
     title="Patient History MCP Server",
     description="Provides patient telemetry history and NL2SQL tools",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # ── Forbidden SQL keywords per agent.md Section 7.2 ─────────
@@ -42,6 +73,15 @@ FORBIDDEN_KEYWORDS: set[str] = {
 }
 SQL_MAX_LENGTH: int = 2000
 
+# Glucose history lookback for get_patient_context
+_HISTORY_WINDOW_S: int = 24 * 60 * 60
+_HISTORY_STREAM_BATCH: int = 200  # rows fetched per round from the server cursor
+
+# Single-pass, case-insensitive scan for any forbidden keyword as a whole word
+_FORBIDDEN_RE = re.compile(
+    r"\b(?:" + "|".join(sorted(FORBIDDEN_KEYWORDS)) + r")\b", re.IGNORECASE
+)
+
 
 # ── Request / Response models ────────────────────────────────
 
@@ -49,13 +89,13 @@ class PatientContextRequest(BaseModel):
     """Request body for get_patient_context tool."""
 
     user_id: str
-    reference_time: str
+    reference_time: float  # Unix epoch seconds, wall-clock time read as UTC
 
 
 class GlucoseRecord(BaseModel):
     """Single glucose reading with timestamp."""
 
-    time: str
+    time: float  # Unix epoch seconds, wall-clock time read as UTC
     glucose: float
 
 
@@ -98,52 +138,68 @@ def validate_sql(sql: str) -> None:
 
     Raises ValueError if SQL contains forbidden keywords or exceeds length limit.
     """
-    lower = sql.lower()
-    for kw in FORBIDDEN_KEYWORDS:
-        if kw in lower:
-            raise ValueError(f"Forbidden SQL operation: {kw}")
+    match = _FORBIDDEN_RE.search(sql)
+    if match:
+        raise ValueError(f"Forbidden SQL operation: {match.group(0).lower()}")
     if len(sql) > SQL_MAX_LENGTH:
         raise ValueError("SQL exceeds maximum length limit")
 
 
-# ── Tool endpoints ───────────────────────────────────────────
-
-@app.post("/tools/get_patient_context", response_model=PatientContextResponse)
-async def get_patient_context(
-    request: PatientContextRequest,
-) -> PatientContextResponse:
-    """
-    Retrieve patient context including 24h glucose history,
-    upcoming predicted activities, and recent exercise glucose drops.
-    """
-    try:
-        ref_time = datetime.fromisoformat(request.reference_time)
-    except ValueError:
-        ref_time = datetime.utcnow()
-
-    cutoff_24h = ref_time - timedelta(hours=24)
-
-    async with _async_session() as session:
-        # Fetch 24h glucose history
-        result = await session.execute(
+# ── Diagnostics ──────────────────────────────────────────────
+
+@app.get("/debug/pool")
+async def pool_status(request: Request) -> dict[str, str]:
+    """Report the database connection pool usage for capacity monitoring."""
+    return {"status": request.app.state.engine.pool.status()}
+
+
+# ── Patient context queries ──────────────────────────────────
+# Each query uses its own session so the three can run concurrently on the pool.
+
+async def _fetch_glucose_history(
+    session_factory: async_sessionmaker[AsyncSession],
+    user_id: str,
+    ref_ts: float,
+) -> list[dict]:
+    """Fetch glucose readings from the 24 hours before ref_ts, newest first."""
+    # recorded_at is naive wall-clock time. Both conversions below treat it as
+    # UTC without consulting the MySQL session time zone: the cutoff is built in
+    # Python, and TIMESTAMPDIFF from the epoch is plain calendar arithmetic.
+    # Rows are streamed in partitions rather than materialized with fetchall().
+    cutoff = datetime.fromtimestamp(
+        ref_ts - _HISTORY_WINDOW_S, timezone.utc
+    ).replace(tzinfo=None)
+    history: list[dict] = []
+    async with session_factory() as session:
+        result = await session.stream(
             text(
-                "SELECT recorded_at, glucose FROM user_telemetry_log "
+                "SELECT TIMESTAMPDIFF(SECOND, '1970-01-01', recorded_at), glucose "
+                "FROM user_telemetry_log "
                 "WHERE user_id = :uid AND recorded_at >= :cutoff "
                 "ORDER BY recorded_at DESC LIMIT 1000"
             ),
-            {"uid": request.user_id, "cutoff": cutoff_24h},
+            {"uid": user_id, "cutoff": cutoff},
+            execution_options={"yield_per": _HISTORY_STREAM_BATCH},
         )
-        rows = result.fetchall()
-        glucose_history = [
-            GlucoseRecord(time=str(row[0]), glucose=float(row[1]))
-            for row in rows
-            if row[1] is not None
-        ]
-
-        # Fetch upcoming activity predictions
-        current_dow = ref_time.weekday()
-        current_hour = ref_time.hour
-        activity_result = await session.execute(
+        async for partition in result.partitions():
+            # Plain dicts in GlucoseRecord shape, serialized directly by orjson
+            history.extend(
+                {"time": float(row[0]), "glucose": float(row[1])}
+                for row in partition
+                if row[1] is not None
+            )
+    return history
+
+
+async def _fetch_upcoming_activity(
+    session_factory: async_sessionmaker[AsyncSession],
+    user_id: str,
+    ref_time: datetime,
+) -> Optional[dict]:
+    """Fetch the most likely activity in the next two hours, if any."""
+    current_hour = ref_time.hour
+    async with session_factory() as session:
+        result = await session.execute(
             text(
                 "SELECT activity_type, probability, hour_of_day, avg_glucose_drop "
                 "FROM user_weekly_patterns "
@@ -153,34 +209,69 @@ async def get_patient_context(
                 "ORDER BY probability DESC LIMIT 1"
             ),
             {
-                "uid": request.user_id,
-                "dow": current_dow,
+                "uid": user_id,
+                "dow": ref_time.weekday(),
                 "h_start": current_hour,
                 "h_end": min(current_hour + 2, 23),
             },
         )
-        activity_row = activity_result.fetchone()
-        upcoming_activity = None
-        if activity_row:
-            upcoming_activity = UpcomingActivity(
-                type=activity_row[0],
-                probability=float(activity_row[1]),
-                expected_start_hour=int(activity_row[2]),
-                avg_glucose_drop=float(activity_row[3] or 0),
-            )
-
-        # Fetch recent exercise glucose drops (last 7 days)
-        week_ago = ref_time - timedelta(days=7)
-        drops_result = await session.execute(
+        row = result.fetchone()
+    if row is None:
+        return None
+    return {
+        "type": row[0],
+        "probability": float(row[1]),
+        "expected_start_hour": int(row[2]),
+        "avg_glucose_drop": float(row[3] or 0),
+    }
+
+
+async def _fetch_recent_drops(
+    session_factory: async_sessionmaker[AsyncSession],
+    user_id: str,
+) -> list[float]:
+    """Fetch the most recent recorded exercise glucose drops."""
+    async with session_factory() as session:
+        result = await session.execute(
             text(
                 "SELECT avg_glucose_drop FROM user_weekly_patterns "
                 "WHERE user_id = :uid AND avg_glucose_drop IS NOT NULL "
                 "ORDER BY id DESC LIMIT 5"
             ),
-            {"uid": request.user_id},
+            {"uid": user_id},
         )
-        drops_rows = drops_result.fetchall()
-        recent_drops = [float(row[0]) for row in drops_rows]
+        rows = result.fetchall()
+    return [float(row[0]) for row in rows]
+
+
+# ── Tool endpoints ───────────────────────────────────────────
+
+@app.post(
+    "/tools/get_patient_context",
+    response_model=None,
+    responses={200: {"model": PatientContextResponse}},
+)
+async def get_patient_context(
+    request: PatientContextRequest,
+    session_factory: async_sessionmaker[AsyncSession] = Depends(get_session_factory),
+) -> Response:
+    """
+    Retrieve patient context including 24h glucose history,
+    upcoming predicted activities, and recent exercise glucose drops.
+
+    The body follows PatientContextResponse but is serialized once with orjson
+    instead of building and re-validating up to 1000 GlucoseRecord models.
+    """
+    # Wall-clock time for the day-of-week / hour-of-day pattern lookup
+    ref_time = datetime.fromtimestamp(request.reference_time, timezone.utc)
+
+    glucose_history, upcoming_activity, recent_drops = await asyncio.gather(
+        _fetch_glucose_history(
+            session_factory, request.user_id, request.reference_time
+        ),
+        _fetch_upcoming_activity(session_factory, request.user_id, ref_time),
+        _fetch_recent_drops(session_factory, request.user_id),
+    )
 
     logger.info(
         "patient_context_served",
@@ -189,10 +280,15 @@ async def get_patient_context(
         has_upcoming_activity=upcoming_activity is not None,
     )
 
-    return PatientContextResponse(
-        glucose_history_24h=glucose_history,
-        upcoming_activity=upcoming_activity,
-        recent_exercise_drops=recent_drops,
+    return Response(
+        content=orjson.dumps(
+            {
+                "glucose_history_24h": glucose_history,
+                "upcoming_activity": upcoming_activity,
+                "recent_exercise_drops": recent_drops,
+            }
+        ),
+        media_type="application/json",
     )
 
 
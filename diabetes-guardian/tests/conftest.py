@@ -0,0 +1,90 @@
+"""
+tests/conftest.py
+
+Shared pytest fixtures.
+Database mocks are built once per test session and reset after every test that
+requests reset_session_mocks, so tests do not rebuild identical AsyncMock wiring.
+Telemetry payloads are built once per module and shared; tests must not mutate them.
+Async tests run on uvloop when it is installed (it ships with uvicorn[standard])
+and share one session-scoped event loop (see pytest.ini).
+"""
+
+import asyncio
+from collections.abc import Callable, Iterator
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from gateway.schemas import TelemetryPayload
+from tests.fixtures import build_mock_db_session, build_telemetry
+
+try:
+    import uvloop
+except ImportError:  # uvloop is not available on Windows
+    uvloop = None
+
+if uvloop is not None:
+
+    def pytest_asyncio_loop_factories(
+        config: pytest.Config,
+        item: pytest.Item,
+    ) -> dict[str, Callable[[], asyncio.AbstractEventLoop]]:
+        """Run async tests on uvloop instead of the default asyncio loop."""
+        return {"uvloop": uvloop.new_event_loop}
+
+
+@pytest.fixture(scope="session")
+def prebuilt_session() -> AsyncMock:
+    """Async DB session whose queries report recent telemetry, built once per run."""
+    return build_mock_db_session()
+
+
+@pytest.fixture(scope="session")
+def mock_session_cls(prebuilt_session: AsyncMock) -> MagicMock:
+    """
+    Stand-in for AsyncSessionLocal that always opens prebuilt_session.
+
+    Patch it in with patch.object(module, "AsyncSessionLocal", mock_session_cls).
+    """
+    return MagicMock(return_value=prebuilt_session)
+
+
+@pytest.fixture
+def reset_session_mocks(
+    mock_session_cls: MagicMock, prebuilt_session: AsyncMock
+) -> Iterator[None]:
+    """
+    Clear recorded calls on the shared session mocks after each test.
+
+    Not autouse: only tests that patch in the session mocks request it, so the
+    rest never set them up.
+    """
+    yield
+    mock_session_cls.reset_mock()
+    prebuilt_session.reset_mock()
+
+
+# ── Telemetry payloads ───────────────────────────────────────
+
+@pytest.fixture(scope="module")
+def low_glucose_payload() -> TelemetryPayload:
+    """Glucose below GLUCOSE_HARD_LOW."""
+    return build_telemetry(glucose=3.1)
+
+
+@pytest.fixture(scope="module")
+def high_hr_payload() -> TelemetryPayload:
+    """Heart rate above the age-adjusted maximum for TEST_USER_AGE (167.4 bpm)."""
+    return build_telemetry(heart_rate=170, glucose=6.0)
+
+
+@pytest.fixture(scope="module")
+def normal_payload() -> TelemetryPayload:
+    """Normal glucose and heart rate."""
+    return build_telemetry(glucose=5.5, heart_rate=80)
+
+
+@pytest.fixture(scope="module")
+def safe_glucose_payload() -> TelemetryPayload:
+    """Glucose above the soft-low buffer range."""
+    return build_telemetry(glucose=6.2, heart_rate=80)
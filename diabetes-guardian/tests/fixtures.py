@@ -5,7 +5,10 @@ Shared test data and helper functions for constructing test payloads.
 All tests must use these fixtures instead of hardcoding test values.
 """
 
+from collections.abc import AsyncIterator, Callable
 from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
 
 from gateway.schemas import InvestigationTask, TelemetryPayload
 
@@ -60,6 +63,7 @@ def build_initial_state(
             "user_id": user_id,
             "trigger_type": trigger_type,
             "trigger_at": "2024-06-15T13:30:00",
+            "trigger_at_dt": datetime(2024, 6, 15, 13, 30, 0),
             "current_glucose": glucose,
             "current_hr": heart_rate,
             "gps_lat": 39.9042,
@@ -79,6 +83,35 @@ def build_initial_state(
     }
 
 
+def build_llm_stream(
+    content: str,
+    chunk_size: int = 16,
+) -> Callable[..., AsyncIterator[SimpleNamespace]]:
+    """Build a fake LLM astream() that yields content in fixed-size chunks."""
+
+    async def _astream(messages: list) -> AsyncIterator[SimpleNamespace]:
+        for i in range(0, len(content), chunk_size):
+            yield SimpleNamespace(content=content[i:i + chunk_size])
+
+    return _astream
+
+
+def build_mock_db_session(has_recent_telemetry: bool = True) -> AsyncMock:
+    """
+    Build an async DB session mock usable as `async with AsyncSessionLocal()`.
+
+    Its queries report whether the user has recent telemetry, which is all the
+    triage data-gap check reads (via result.first()).
+    """
+    row = (1,) if has_recent_telemetry else None
+    session = AsyncMock()
+    # A plain namespace is far cheaper to build than a MagicMock result
+    session.execute = AsyncMock(return_value=SimpleNamespace(first=lambda: row))
+    session.__aenter__ = AsyncMock(return_value=session)
+    session.__aexit__ = AsyncMock(return_value=False)
+    return session
+
+
 # ── Test user profile ───────────────────────────────────────
 
 TEST_USER_BIRTH_YEAR: int = 1990
@@ -5,15 +5,36 @@ Integration tests for the LangGraph agent workflow.
 All MCP calls and LLM invocations are mocked per agent.md Section 9.3.
 """
 
-from unittest.mock import AsyncMock, patch
+import asyncio
+import os
+import threading
+import time
+from collections.abc import Iterator
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import httpx
+import orjson
 import pytest
+from structlog.testing import capture_logs
 
-from tests.fixtures import build_initial_state
+from tests.fixtures import build_initial_state, build_llm_stream
+
+
+@pytest.fixture
+def non_utc_local_tz() -> Iterator[None]:
+    """Run the test with the process local time zone set to UTC+8."""
+    previous = os.environ.get("TZ")
+    os.environ["TZ"] = "Asia/Shanghai"
+    time.tzset()
+    yield
+    if previous is None:
+        del os.environ["TZ"]
+    else:
+        os.environ["TZ"] = previous
+    time.tzset()
 
 
-@pytest.mark.asyncio
 async def test_investigator_node_gathers_context() -> None:
     """Investigator should call both MCP servers concurrently and populate state."""
     mock_location = {
@@ -22,7 +43,7 @@ async def test_investigator_node_gathers_context() -> None:
         "nearby_known_places": [],
     }
     mock_history = {
-        "glucose_history_24h": [{"time": "2024-06-15T12:00:00", "glucose": 5.2}],
+        "glucose_history_24h": [{"time": 1718452800.0, "glucose": 5.2}],
         "upcoming_activity": {
             "type": "resistance_training",
             "probability": 0.85,
@@ -52,7 +73,6 @@ async def test_investigator_node_gathers_context() -> None:
         assert len(result["recent_exercise_glucose_drops"]) == 3
 
 
-@pytest.mark.asyncio
 async def test_investigator_node_degrades_on_mcp_timeout() -> None:
     """Investigator should return fallback values when MCP servers timeout."""
     with patch(
@@ -73,22 +93,72 @@ async def test_investigator_node_degrades_on_mcp_timeout() -> None:
         assert result["glucose_history_24h"] == []
 
 
-@pytest.mark.asyncio
+@pytest.mark.usefixtures("non_utc_local_tz")
+async def test_investigator_sends_wall_clock_as_utc_epoch() -> None:
+    """reference_time must not shift with the worker's local time zone."""
+    with patch(
+        "agent.nodes.investigator.call_location_context_mcp",
+        new_callable=AsyncMock,
+        return_value={"semantic_location": "在家中"},
+    ), patch(
+        "agent.nodes.investigator.call_patient_history_mcp",
+        new_callable=AsyncMock,
+        return_value={"glucose_history_24h": []},
+    ) as mock_history:
+        from agent.nodes.investigator import investigator_node
+
+        await investigator_node(build_initial_state())
+
+    # 2024-06-15T13:30:00 read as UTC
+    mock_history.assert_awaited_once_with("user_001", 1718458200.0)
+
+
+async def test_http_client_from_previous_loop_is_closed_on_replacement() -> None:
+    """A loop change must close the old client instead of leaking its sockets."""
+    from agent import http
+
+    async def _get_client() -> httpx.AsyncClient:
+        return http.get_client()
+
+    old_loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=old_loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        old_client = asyncio.run_coroutine_threadsafe(_get_client(), old_loop).result()
+
+        new_client = http.get_client()
+        for _ in range(100):
+            if old_client.is_closed:
+                break
+            await asyncio.sleep(0.01)
+
+        assert new_client is not old_client
+        assert old_client.is_closed
+        assert not new_client.is_closed
+    finally:
+        await http.close_client()
+        old_loop.call_soon_threadsafe(old_loop.stop)
+        thread.join()
+        old_loop.close()
+
+
 async def test_reflector_node_returns_valid_assessment() -> None:
     """Reflector should parse LLM response into structured risk assessment."""
-    mock_llm_response = AsyncMock()
-    mock_llm_response.content = (
+    llm_content = (
         '{"risk_level": "MEDIUM", '
         '"reasoning_summary": "Pre-exercise glucose buffer is low", '
         '"intervention_action": "SOFT_REMIND"}'
     )
 
-    with patch(
-        "agent.nodes.reflector.ChatGoogleGenerativeAI"
-    ) as mock_llm_cls:
+    mock_redis = AsyncMock()
+    mock_redis.get.return_value = None
+
+    with patch("agent.nodes.reflector._get_llm") as mock_get_llm, patch(
+        "agent.nodes.reflector._get_redis", return_value=mock_redis
+    ):
         mock_llm = AsyncMock()
-        mock_llm.ainvoke = AsyncMock(return_value=mock_llm_response)
-        mock_llm_cls.return_value = mock_llm
+        mock_llm.astream = build_llm_stream(llm_content)
+        mock_get_llm.return_value = mock_llm
 
         from agent.nodes.reflector import reflector_node
 
@@ -102,17 +172,109 @@ async def test_reflector_node_returns_valid_assessment() -> None:
 
         assert result["risk_level"] == "MEDIUM"
         assert result["intervention_action"] == "SOFT_REMIND"
+        mock_redis.setex.assert_awaited_once()
+
+
+async def test_reflector_node_stops_streaming_after_json_object() -> None:
+    """Reflector should parse the first JSON object and ignore trailing tokens."""
+    llm_content = (
+        '```json\n{"risk_level": "HIGH", '
+        '"reasoning_summary": "Braces {in} \\"text\\"", '
+        '"intervention_action": "STRONG_ALERT"}\n```\nExplanation follows.'
+    )
+    mock_redis = AsyncMock()
+    mock_redis.get.return_value = None
+
+    with patch("agent.nodes.reflector._get_llm") as mock_get_llm, patch(
+        "agent.nodes.reflector._get_redis", return_value=mock_redis
+    ):
+        mock_llm = AsyncMock()
+        mock_llm.astream = build_llm_stream(llm_content, chunk_size=7)
+        mock_get_llm.return_value = mock_llm
+
+        from agent.nodes.reflector import reflector_node
+
+        state = build_initial_state()
+        state["location_context"] = "在家中"
+
+        result = await reflector_node(state)
+
+        assert result["risk_level"] == "HIGH"
+        assert result["reasoning_summary"] == 'Braces {in} "text"'
+        assert result["intervention_action"] == "STRONG_ALERT"
+
+
+async def test_reflector_node_falls_back_on_invalid_schema() -> None:
+    """Reflector should use rule-based fallback when LLM JSON fails validation."""
+    llm_content = (
+        '{"risk_level": "CRITICAL", '
+        '"reasoning_summary": "Unknown level", '
+        '"intervention_action": "SOFT_REMIND"}'
+    )
+    mock_redis = AsyncMock()
+    mock_redis.get.return_value = None
+
+    with patch("agent.nodes.reflector._get_llm") as mock_get_llm, patch(
+        "agent.nodes.reflector._get_redis", return_value=mock_redis
+    ):
+        mock_llm = AsyncMock()
+        mock_llm.astream = build_llm_stream(llm_content)
+        mock_get_llm.return_value = mock_llm
+
+        from agent.nodes.reflector import reflector_node
+
+        state = build_initial_state()
+        state["location_context"] = "在家中"
+        state["glucose_history_24h"] = []
+        state["upcoming_activity"] = None
+        state["recent_exercise_glucose_drops"] = []
+
+        result = await reflector_node(state)
+
+        assert result["risk_level"] == "MEDIUM"
+        assert "规则兜底" in result["reasoning_summary"]
+        mock_redis.setex.assert_not_called()
+
+
+async def test_reflector_node_serves_cached_assessment() -> None:
+    """Reflector should reuse a cached assessment without calling the LLM."""
+    mock_redis = AsyncMock()
+    mock_redis.get.return_value = (
+        b'{"risk_level": "LOW", '
+        b'"reasoning_summary": "Glucose stable", '
+        b'"intervention_action": "NO_ACTION"}'
+    )
+
+    with patch("agent.nodes.reflector._get_llm") as mock_get_llm, patch(
+        "agent.nodes.reflector._get_redis", return_value=mock_redis
+    ):
+        from agent.nodes.reflector import reflector_node
+
+        state = build_initial_state()
+        state["location_context"] = "在家中"
+        state["glucose_history_24h"] = []
+        state["upcoming_activity"] = None
+        state["recent_exercise_glucose_drops"] = []
+
+        result = await reflector_node(state)
+
+        assert result["risk_level"] == "LOW"
+        assert result["intervention_action"] == "NO_ACTION"
+        mock_get_llm.assert_not_called()
+        mock_redis.setex.assert_not_called()
 
 
-@pytest.mark.asyncio
 async def test_reflector_node_falls_back_on_llm_failure() -> None:
     """Reflector should use rule-based fallback when LLM fails."""
-    with patch(
-        "agent.nodes.reflector.ChatGoogleGenerativeAI"
-    ) as mock_llm_cls:
+    mock_redis = AsyncMock()
+    mock_redis.get.return_value = None
+
+    with patch("agent.nodes.reflector._get_llm") as mock_get_llm, patch(
+        "agent.nodes.reflector._get_redis", return_value=mock_redis
+    ):
         mock_llm = AsyncMock()
-        mock_llm.ainvoke = AsyncMock(side_effect=Exception("LLM unavailable"))
-        mock_llm_cls.return_value = mock_llm
+        mock_llm.astream = MagicMock(side_effect=Exception("LLM unavailable"))
+        mock_get_llm.return_value = mock_llm
 
         from agent.nodes.reflector import reflector_node
 
@@ -127,3 +289,294 @@ async def test_reflector_node_falls_back_on_llm_failure() -> None:
         assert result["risk_level"] == "MEDIUM"
         assert result["intervention_action"] == "SOFT_REMIND"
         assert "规则兜底" in result["reasoning_summary"]
+
+
+async def test_reflector_node_logs_client_errors_as_call_failures() -> None:
+    """A client construction error is a call failure, not a parse failure."""
+    from pydantic import BaseModel
+
+    class _Settings(BaseModel):
+        google_api_key: str
+
+    def _raise_validation_error() -> None:
+        _Settings.model_validate({})
+
+    mock_redis = AsyncMock()
+    mock_redis.get.return_value = None
+
+    with patch(
+        "agent.nodes.reflector._get_llm", side_effect=_raise_validation_error
+    ), patch(
+        "agent.nodes.reflector._get_redis", return_value=mock_redis
+    ), capture_logs() as logs:
+        from agent.nodes.reflector import reflector_node
+
+        result = await reflector_node(build_initial_state())
+
+    events = [entry["event"] for entry in logs]
+    assert "llm_call_failed" in events
+    assert "llm_parse_failed" not in events
+    assert result["intervention_action"] == "SOFT_REMIND"
+
+
+async def test_reflector_node_assesses_pre_exercise_trigger_at_safe_boundary() -> None:
+    """A pre-exercise trigger must reach the LLM even if the MCP found no activity."""
+    llm_content = (
+        '{"risk_level": "MEDIUM", '
+        '"reasoning_summary": "Activity expected with glucose at the safe floor", '
+        '"intervention_action": "SOFT_REMIND"}'
+    )
+
+    mock_redis = AsyncMock()
+    mock_redis.get.return_value = None
+
+    with patch("agent.nodes.reflector._get_llm") as mock_get_llm, patch(
+        "agent.nodes.reflector._get_redis", return_value=mock_redis
+    ):
+        mock_llm = AsyncMock()
+        mock_llm.astream = build_llm_stream(llm_content)
+        mock_get_llm.return_value = mock_llm
+
+        from agent.nodes.reflector import reflector_node
+
+        # 5.6 mmol/L is both the top of the soft-low range and the exercise-safe floor
+        state = build_initial_state(
+            trigger_type="SOFT_PRE_EXERCISE_LOW_BUFFER", glucose=5.6
+        )
+        state["location_context"] = "在家中"
+        state["glucose_history_24h"] = []
+        # Patient History MCP timed out or its hour window missed the activity
+        state["upcoming_activity"] = None
+        state["recent_exercise_glucose_drops"] = []
+
+        result = await reflector_node(state)
+
+        mock_get_llm.assert_called_once()
+        assert result["intervention_action"] == "SOFT_REMIND"
+
+
+@pytest.mark.parametrize(
+    ("glucose", "expect_fast_path"),
+    [
+        # -0.1 mmol/L/min for 30 min ends at 6.0, still above the safe floor
+        (9.0, True),
+        # The same decline ends at 4.0, below the safe floor
+        (7.0, False),
+    ],
+    ids=["decline_stays_safe", "decline_leaves_safe_range"],
+)
+async def test_reflector_node_fast_path_for_decline_trigger(
+    glucose: float, expect_fast_path: bool
+) -> None:
+    """A decline trigger skips the LLM only if the projected glucose stays safe."""
+    mock_redis = AsyncMock()
+    mock_redis.get.return_value = None
+
+    with patch("agent.nodes.reflector._get_llm") as mock_get_llm, patch(
+        "agent.nodes.reflector._get_redis", return_value=mock_redis
+    ):
+        mock_llm = AsyncMock()
+        mock_llm.astream = build_llm_stream(
+            '{"risk_level": "MEDIUM", "reasoning_summary": "Falling", '
+            '"intervention_action": "SOFT_REMIND"}'
+        )
+        mock_get_llm.return_value = mock_llm
+
+        from agent.nodes.reflector import reflector_node
+
+        state = build_initial_state(
+            trigger_type="SOFT_GLUCOSE_DECLINE_SLOPE", glucose=glucose
+        )
+        state["location_context"] = "在家中"
+        # Newest first, one reading every 5 minutes falling 0.5 mmol/L each
+        state["glucose_history_24h"] = [
+            {"time": 1718458200.0 - 300 * i, "glucose": glucose + 0.5 * i}
+            for i in range(5)
+        ]
+        state["upcoming_activity"] = None
+        state["recent_exercise_glucose_drops"] = []
+
+        result = await reflector_node(state)
+
+    if expect_fast_path:
+        assert result["risk_level"] == "LOW"
+        assert result["intervention_action"] == "NO_ACTION"
+        mock_get_llm.assert_not_called()
+    else:
+        assert result["intervention_action"] == "SOFT_REMIND"
+        mock_get_llm.assert_called_once()
+
+
+@pytest.mark.usefixtures("non_utc_local_tz")
+def test_reflector_prompt_summarizes_glucose_history() -> None:
+    """Reflector prompt should carry history statistics, not every record."""
+    from agent.nodes.reflector import build_user_prompt
+    from agent.state import PromptInputs
+
+    state = build_initial_state()
+    state["glucose_history_24h"] = [
+        {
+            "time": datetime(
+                2024, 6, 15, 13, 30 - 2 * i, tzinfo=timezone.utc
+            ).timestamp(),
+            "glucose": 4.8 + 0.1 * i,
+        }
+        for i in range(10)
+    ]
+
+    prompt = build_user_prompt(PromptInputs.from_state(state))
+
+    assert "24h glucose history (10 records)" in prompt
+    assert "slope=-0.050 mmol/L/min" in prompt
+    assert "06-15 13:22" in prompt
+    assert "06-15 13:20" not in prompt
+
+
+def test_reflector_prompt_skips_legacy_and_empty_history_readings() -> None:
+    """ISO-string times from an older MCP and glucose=None must not break the prompt."""
+    from agent.nodes.reflector import build_user_prompt
+    from agent.state import PromptInputs
+
+    state = build_initial_state()
+    state["glucose_history_24h"] = [
+        {"time": 1718458200.0, "glucose": 5.0},
+        {"time": "2024-06-15T13:25:00", "glucose": 5.2},
+        {"time": 1718457600.0, "glucose": None},
+        {"time": 1718457300.0, "glucose": 5.4},
+    ]
+
+    prompt = build_user_prompt(PromptInputs.from_state(state))
+
+    assert "24h glucose history (2 records)" in prompt
+    assert "(06-15 13:30, 5.0), (06-15 13:15, 5.4)" in prompt
+
+
+def test_reflector_prompt_omits_history_without_usable_readings() -> None:
+    """A history made only of legacy readings is left out of the prompt."""
+    from agent.nodes.reflector import build_user_prompt
+    from agent.state import PromptInputs
+
+    state = build_initial_state()
+    state["glucose_history_24h"] = [{"time": "2024-06-15T13:25:00", "glucose": 5.2}]
+
+    prompt = build_user_prompt(PromptInputs.from_state(state))
+
+    assert "24h glucose history" not in prompt
+
+
+async def test_combined_node_assesses_and_notifies_in_one_call() -> None:
+    """Combined node should return the assessment and deliver the LLM message."""
+    mock_llm_response = AsyncMock()
+    mock_llm_response.content = (
+        '{"risk_level": "MEDIUM", '
+        '"reasoning_summary": "Pre-exercise glucose buffer is low", '
+        '"intervention_action": "SOFT_REMIND", '
+        '"message_to_user": "当前血糖 4.8 mmol/L，运动前建议吃 15 克碳水。"}'
+    )
+
+    with patch("agent.nodes.combined._get_llm") as mock_get_llm, patch(
+        "agent.nodes.combined.deliver_message",
+        new_callable=AsyncMock,
+        return_value=True,
+    ) as mock_deliver:
+        mock_llm = AsyncMock()
+        mock_llm.ainvoke = AsyncMock(return_value=mock_llm_response)
+        mock_get_llm.return_value = mock_llm
+
+        from agent.nodes.combined import combined_node
+
+        state = build_initial_state()
+        state["location_context"] = "在家中"
+
+        result = await combined_node(state)
+
+        assert mock_llm.ainvoke.await_count == 1
+        assert result["intervention_action"] == "SOFT_REMIND"
+        assert result["notification_sent"] is True
+        assert "4.8" in result["message_to_user"]
+        mock_deliver.assert_awaited_once()
+
+
+async def test_combined_node_skips_notification_on_no_action() -> None:
+    """Combined node should ignore message_to_user when no action is needed."""
+    mock_llm_response = AsyncMock()
+    mock_llm_response.content = (
+        '{"risk_level": "LOW", '
+        '"reasoning_summary": "Glucose stable", '
+        '"intervention_action": "NO_ACTION", '
+        '"message_to_user": "ignored"}'
+    )
+
+    with patch("agent.nodes.combined._get_llm") as mock_get_llm, patch(
+        "agent.nodes.combined.deliver_message", new_callable=AsyncMock
+    ) as mock_deliver:
+        mock_llm = AsyncMock()
+        mock_llm.ainvoke = AsyncMock(return_value=mock_llm_response)
+        mock_get_llm.return_value = mock_llm
+
+        from agent.nodes.combined import combined_node
+
+        result = await combined_node(build_initial_state())
+
+        assert result["message_to_user"] is None
+        assert result["notification_sent"] is False
+        mock_deliver.assert_not_called()
+
+
+async def test_combined_node_falls_back_when_llm_client_cannot_be_built() -> None:
+    """A client construction error (e.g. empty API key) should use the fallback."""
+    from pydantic import BaseModel
+
+    class _Settings(BaseModel):
+        google_api_key: str
+
+    def _raise_validation_error() -> None:
+        _Settings.model_validate({})
+
+    with patch(
+        "agent.nodes.combined._get_llm", side_effect=_raise_validation_error
+    ), patch(
+        "agent.nodes.combined.deliver_message",
+        new_callable=AsyncMock,
+        return_value=True,
+    ) as mock_deliver:
+        from agent.nodes.combined import combined_node
+
+        result = await combined_node(build_initial_state())
+
+        assert result["risk_level"] == "MEDIUM"
+        assert result["intervention_action"] == "SOFT_REMIND"
+        assert result["message_to_user"]
+        mock_deliver.assert_awaited_once()
+
+
+@pytest.mark.parametrize("as_json_string", [False, True], ids=["dict", "json_string"])
+def test_run_investigation_accepts_dict_and_legacy_json_string(
+    as_json_string: bool,
+) -> None:
+    """Tasks queued before the orjson payload change arrive as a JSON string."""
+    from agent.main import run_investigation
+
+    task = {"user_id": "user_001", "trigger_at": "2024-06-15T13:30:00"}
+    payload = orjson.dumps(task).decode() if as_json_string else task
+
+    with patch("agent.main._run_graph", new_callable=AsyncMock) as mock_run_graph:
+        run_investigation(payload)
+
+    mock_run_graph.assert_awaited_once_with(task)
+
+
+async def test_close_redis_closes_and_forgets_the_cache_client() -> None:
+    """Worker shutdown should close the Reflector cache client it created."""
+    from agent.nodes import reflector
+
+    mock_redis = AsyncMock()
+    reflector._get_redis.cache_clear()
+    with patch("agent.nodes.reflector.redis.from_url", return_value=mock_redis):
+        assert reflector._get_redis() is mock_redis
+
+        await reflector.close_redis()
+        await reflector.close_redis()  # no client left: a no-op
+
+    mock_redis.aclose.assert_awaited_once()
+    assert reflector._get_redis.cache_info().currsize == 0
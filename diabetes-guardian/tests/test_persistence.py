@@ -0,0 +1,146 @@
+"""
+tests/test_persistence.py
+
+Unit tests for the telemetry micro-batch writer in gateway/services/persistence.py.
+The database session is mocked per agent.md Section 9.3.
+"""
+
+import asyncio
+from collections.abc import AsyncIterator
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from gateway.services import persistence
+from gateway.services.persistence import (
+    persist_telemetry,
+    start_telemetry_writer,
+    stop_telemetry_writer,
+)
+from tests.fixtures import build_mock_db_session, build_telemetry
+
+
+def _inserted_batches(session: AsyncMock) -> list[list[dict]]:
+    """Rows passed to each session.execute(insert(...), rows) call."""
+    return [call.args[1] for call in session.execute.await_args_list]
+
+
+@pytest.fixture
+async def writer_session() -> AsyncIterator[AsyncMock]:
+    """
+    Patch persistence's AsyncSessionLocal with a fresh session mock.
+
+    Any writer a test started is stopped before the patch is removed, so it
+    never outlives the test on the shared event loop.
+    """
+    session = build_mock_db_session()
+    with patch.object(
+        persistence, "AsyncSessionLocal", MagicMock(return_value=session)
+    ):
+        yield session
+        await stop_telemetry_writer()
+
+
+async def test_writer_flushes_when_batch_is_full(writer_session: AsyncMock) -> None:
+    """A full batch is written immediately, without waiting for the window."""
+    with patch.object(persistence, "_TELEMETRY_BATCH_MAX", 3), patch.object(
+        persistence, "_TELEMETRY_BATCH_WINDOW_S", 60.0
+    ):
+        await start_telemetry_writer()
+        for i in range(4):
+            await persist_telemetry(build_telemetry(user_id=f"user_{i}"))
+        # Far shorter than the window, so only the size limit can flush here
+        await asyncio.sleep(0.01)
+
+        batches = _inserted_batches(writer_session)
+        assert [len(batch) for batch in batches] == [3]
+
+        await stop_telemetry_writer()
+
+    assert [len(batch) for batch in _inserted_batches(writer_session)] == [3, 1]
+
+
+async def test_writer_flushes_partial_batch_after_window(
+    writer_session: AsyncMock,
+) -> None:
+    """A partial batch is written once the batching window has elapsed."""
+    await start_telemetry_writer()
+    await persist_telemetry(build_telemetry())
+    await asyncio.sleep(0)
+    assert _inserted_batches(writer_session) == []
+
+    await asyncio.sleep(persistence._TELEMETRY_BATCH_WINDOW_S * 3)
+
+    assert [len(batch) for batch in _inserted_batches(writer_session)] == [1]
+
+
+async def test_writer_drains_leftovers_after_sentinel(
+    writer_session: AsyncMock,
+) -> None:
+    """Rows queued behind the shutdown sentinel are still written."""
+    rows = [
+        persistence._telemetry_row(build_telemetry(user_id=f"user_{i}"))
+        for i in range(3)
+    ]
+    queue: asyncio.Queue = asyncio.Queue()
+    for item in (rows[0], None, rows[1], rows[2]):
+        queue.put_nowait(item)
+
+    await persistence._telemetry_writer_loop(queue)
+
+    assert _inserted_batches(writer_session) == [[rows[0]], [rows[1], rows[2]]]
+    assert queue.empty()
+
+
+async def test_writer_drains_producers_blocked_on_full_queue(
+    writer_session: AsyncMock,
+) -> None:
+    """Producers woken by the shutdown drain still get their rows written."""
+    rows = [
+        persistence._telemetry_row(build_telemetry(user_id=f"user_{i}"))
+        for i in range(4)
+    ]
+    queue: asyncio.Queue = asyncio.Queue(maxsize=2)
+    queue.put_nowait(rows[0])
+    queue.put_nowait(None)
+    producers = [asyncio.create_task(queue.put(row)) for row in rows[1:]]
+    await asyncio.sleep(0)  # all three producers now block on the full queue
+
+    await persistence._telemetry_writer_loop(queue)
+    await asyncio.gather(*producers)
+
+    written = [row for batch in _inserted_batches(writer_session) for row in batch]
+    assert written == rows
+    assert queue.empty()
+
+
+async def test_persist_inserts_directly_without_writer(
+    writer_session: AsyncMock,
+) -> None:
+    """Outside the gateway lifespan each payload is inserted and committed."""
+    await persist_telemetry(build_telemetry(user_id="user_direct"))
+
+    batches = _inserted_batches(writer_session)
+    assert len(batches) == 1
+    assert batches[0][0]["user_id"] == "user_direct"
+    writer_session.commit.assert_awaited_once()
+
+
+async def test_failed_batch_only_drops_the_bad_row(writer_session: AsyncMock) -> None:
+    """A row the database rejects must not discard the rest of its batch."""
+
+    def _execute(statement: object, rows: list[dict]) -> None:
+        if any(row["user_id"] == "user_bad" for row in rows):
+            raise ValueError("Data too long for column 'user_id'")
+
+    writer_session.execute.side_effect = _execute
+    batch = [
+        persistence._telemetry_row(build_telemetry(user_id=user_id))
+        for user_id in ("user_a", "user_bad", "user_b")
+    ]
+
+    await persistence._flush_telemetry(batch)
+
+    # One failed batch attempt, then a retry per row; only the bad row is lost
+    assert [len(rows) for rows in _inserted_batches(writer_session)] == [3, 1, 1, 1]
+    assert writer_session.commit.await_count == 2
@@ -6,103 +6,173 @@ Covers hard triggers, soft triggers, and degradation scenarios.
 All database and external calls are mocked per agent.md Section 9.3.
 """
 
-from datetime import datetime
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
+from agent.main import celery_app
+from gateway.routers import telemetry
 from gateway.schemas import TelemetryPayload
-from tests.fixtures import TEST_USER_AGE, build_telemetry
-
-
-@pytest.mark.asyncio
-async def test_hard_trigger_fires_on_low_glucose() -> None:
-    """Glucose below GLUCOSE_HARD_LOW should trigger emergency alert."""
-    payload = build_telemetry(glucose=3.1)
-    with patch(
-        "gateway.services.triage.send_emergency_alert", new_callable=AsyncMock
-    ) as mock_alert, patch(
-        "gateway.services.triage.AsyncSessionLocal"
-    ) as mock_session_cls:
-        # Mock database query returning 0 recent records
-        mock_session = AsyncMock()
-        mock_result = MagicMock()
-        mock_result.scalar_one.return_value = 5
-        mock_session.execute = AsyncMock(return_value=mock_result)
-        mock_session.__aenter__ = AsyncMock(return_value=mock_session)
-        mock_session.__aexit__ = AsyncMock(return_value=False)
-        mock_session_cls.return_value = mock_session
-
-        from gateway.services.triage import evaluate_hard_triggers
-
-        result = await evaluate_hard_triggers(payload, user_age=TEST_USER_AGE)
-
-        assert result is True
+from gateway.services import triage
+from gateway.services.triage import evaluate_hard_triggers, evaluate_soft_triggers
+from tests.fixtures import TEST_USER_AGE, build_mock_db_session, build_telemetry
+
+
+@pytest.fixture(autouse=True)
+def _clear_triage_state() -> Iterator[None]:
+    """Start every test without per-user windows or last-seen timestamps."""
+    yield
+    triage._sliding_windows.clear()
+    triage._last_seen.clear()
+
+
+# A high-probability activity as returned by lookup_upcoming_activity
+_UPCOMING_RUN: dict = {
+    "activity_type": "running",
+    "probability": 0.85,
+    "avg_glucose_drop": 2.5,
+    "expected_start_hour": 14,
+}
+
+
+@contextmanager
+def mock_triage_deps(
+    session_cls: MagicMock,
+    alert_mock_cls: type[MagicMock] = AsyncMock,
+) -> Iterator[MagicMock]:
+    """Patch triage's AsyncSessionLocal and alert sender; yield the alert mock."""
+    with (
+        patch.object(triage, "AsyncSessionLocal", session_cls),
+        patch.object(
+            triage, "send_emergency_alert", new_callable=alert_mock_cls
+        ) as mock_alert,
+    ):
+        yield mock_alert
+
+
+@pytest.mark.usefixtures("reset_session_mocks")
+class TestHardTriggers:
+    """evaluate_hard_triggers with the DB session and alert sender patched."""
+
+    @pytest.mark.parametrize(
+        ("payload_fixture", "expected_fire"),
+        [
+            # Glucose below GLUCOSE_HARD_LOW
+            ("low_glucose_payload", True),
+            # For age 34: max HR = (220 - 34) * 0.90 = 167.4
+            ("high_hr_payload", True),
+            # Normal glucose and heart rate
+            ("normal_payload", False),
+        ],
+        ids=["low_glucose", "high_heart_rate", "normal_values"],
+    )
+    async def test_hard_trigger(
+        self,
+        payload_fixture: str,
+        expected_fire: bool,
+        mock_session_cls: MagicMock,
+        request: pytest.FixtureRequest,
+    ) -> None:
+        """Hard triggers should alert exactly when a critical threshold is crossed."""
+        payload = request.getfixturevalue(payload_fixture)
+
+        # The alert is only awaited when a trigger fires; otherwise a plain mock will do
+        alert_mock_cls = AsyncMock if expected_fire else MagicMock
+        with mock_triage_deps(mock_session_cls, alert_mock_cls) as mock_alert:
+            result = await evaluate_hard_triggers(payload, user_age=TEST_USER_AGE)
+
+        assert result is expected_fire
+        assert mock_alert.call_count == int(expected_fire)
+
+    async def test_hard_trigger_detects_gap_without_db_after_first_reading(
+        self, mock_session_cls: MagicMock, prebuilt_session: AsyncMock
+    ) -> None:
+        """After the first reading, the data gap check uses the last-seen cache."""
+        start = datetime(2024, 6, 15, 13, 0, 0)
+        first = build_telemetry(user_id="user_gap", timestamp=start)
+        later = build_telemetry(
+            user_id="user_gap", timestamp=start + timedelta(minutes=45)
+        )
+
+        with mock_triage_deps(mock_session_cls) as mock_alert:
+            assert await evaluate_hard_triggers(first, user_age=TEST_USER_AGE) is False
+            assert await evaluate_hard_triggers(later, user_age=TEST_USER_AGE) is True
+
+        prebuilt_session.execute.assert_awaited_once()
         mock_alert.assert_called_once()
 
+    async def test_hard_trigger_fires_on_data_gap_from_db(self) -> None:
+        """With no cached reading, a DB with no recent telemetry means a data gap."""
+        session = build_mock_db_session(has_recent_telemetry=False)
+        payload = build_telemetry(user_id="user_cold")
 
-@pytest.mark.asyncio
-async def test_hard_trigger_fires_on_high_heart_rate() -> None:
-    """Heart rate exceeding age-adjusted max should trigger emergency alert."""
-    # For age 34: max HR = (220 - 34) * 0.90 = 167.4
-    payload = build_telemetry(heart_rate=170, glucose=6.0)
-    with patch(
-        "gateway.services.triage.send_emergency_alert", new_callable=AsyncMock
-    ) as mock_alert, patch(
-        "gateway.services.triage.AsyncSessionLocal"
-    ) as mock_session_cls:
-        mock_session = AsyncMock()
-        mock_result = MagicMock()
-        mock_result.scalar_one.return_value = 5
-        mock_session.execute = AsyncMock(return_value=mock_result)
-        mock_session.__aenter__ = AsyncMock(return_value=mock_session)
-        mock_session.__aexit__ = AsyncMock(return_value=False)
-        mock_session_cls.return_value = mock_session
-
-        from gateway.services.triage import evaluate_hard_triggers
-
-        result = await evaluate_hard_triggers(payload, user_age=TEST_USER_AGE)
-
-        assert result is True
-        mock_alert.assert_called_once()
-
+        with mock_triage_deps(MagicMock(return_value=session)) as mock_alert:
+            assert await evaluate_hard_triggers(payload, user_age=TEST_USER_AGE) is True
 
-@pytest.mark.asyncio
-async def test_hard_trigger_skips_on_normal_values() -> None:
-    """Normal glucose and heart rate should not trigger."""
-    payload = build_telemetry(glucose=5.5, heart_rate=80)
-    with patch(
-        "gateway.services.triage.send_emergency_alert", new_callable=AsyncMock
-    ) as mock_alert, patch(
-        "gateway.services.triage.AsyncSessionLocal"
-    ) as mock_session_cls:
-        mock_session = AsyncMock()
-        mock_result = MagicMock()
-        mock_result.scalar_one.return_value = 5
-        mock_session.execute = AsyncMock(return_value=mock_result)
-        mock_session.__aenter__ = AsyncMock(return_value=mock_session)
-        mock_session.__aexit__ = AsyncMock(return_value=False)
-        mock_session_cls.return_value = mock_session
-
-        from gateway.services.triage import evaluate_hard_triggers
-
-        result = await evaluate_hard_triggers(payload, user_age=TEST_USER_AGE)
-
-        assert result is False
-        mock_alert.assert_not_called()
-
-
-@pytest.mark.asyncio
-async def test_soft_trigger_skips_on_safe_glucose() -> None:
-    """Glucose outside the soft trigger range should not fire."""
-    payload = build_telemetry(glucose=6.2, heart_rate=80)
-    with patch(
-        "gateway.services.triage._check_upcoming_activity",
-        new_callable=AsyncMock,
-        return_value=None,
-    ):
-        from gateway.services.triage import evaluate_soft_triggers
+        mock_alert.assert_called_once()
 
-        result = await evaluate_soft_triggers(payload, user_age=TEST_USER_AGE)
 
-        assert result is None
+class TestSoftTriggers:
+    """Soft triggers, which need no DB session mocks."""
+
+    async def test_soft_trigger_skips_on_safe_glucose(
+        self, safe_glucose_payload: TelemetryPayload
+    ) -> None:
+        """Glucose above the soft-low range must not enqueue an investigation."""
+        # Even with an activity coming up, only the glucose range decides here
+        with (
+            patch.object(
+                telemetry,
+                "get_user_age",
+                new_callable=AsyncMock,
+                return_value=TEST_USER_AGE,
+            ),
+            patch.object(telemetry, "persist_telemetry", new_callable=AsyncMock),
+            patch.object(
+                telemetry,
+                "evaluate_hard_triggers",
+                new_callable=AsyncMock,
+                return_value=False,
+            ),
+            patch.object(
+                telemetry,
+                "lookup_upcoming_activity",
+                new_callable=AsyncMock,
+                return_value=_UPCOMING_RUN,
+            ),
+            patch.object(celery_app, "send_task") as mock_send_task,
+        ):
+            response = await telemetry.receive_telemetry(safe_glucose_payload)
+
+        assert response == {"status": "received"}
+        mock_send_task.assert_not_called()
+
+    async def test_soft_trigger_fires_on_steady_glucose_decline(self) -> None:
+        """A sustained decline steeper than GLUCOSE_SLOPE_TRIGGER should fire."""
+        start = datetime(2024, 6, 15, 13, 0, 0)
+        result = None
+        # 0.6 mmol/L drop every 5 minutes (-0.12 mmol/L/min)
+        for step in range(4):
+            payload = build_telemetry(
+                user_id="user_slope",
+                timestamp=start + timedelta(minutes=5 * step),
+                glucose=8.0 - 0.6 * step,
+            )
+            result = await evaluate_soft_triggers(payload, user_age=TEST_USER_AGE)
+
+        assert result is not None
+        assert result.trigger_type == "SOFT_GLUCOSE_DECLINE_SLOPE"
+
+    async def test_soft_trigger_fires_on_low_buffer_before_activity(self) -> None:
+        """Glucose in the soft-low range with a prefetched activity should fire."""
+        payload = build_telemetry(user_id="user_buffer", glucose=4.8)
+
+        result = await evaluate_soft_triggers(
+            payload, user_age=TEST_USER_AGE, upcoming=_UPCOMING_RUN
+        )
+
+        assert result is not None
+        assert result.trigger_type == "SOFT_PRE_EXERCISE_LOW_BUFFER"